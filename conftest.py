@@ -0,0 +1,51 @@
+"""
+Shared fixtures: a simulated clock and a bot wired to the simulated Twitter and OpenRouter backends
+"""
+
+import json
+import random
+
+import pytest
+
+import twitter_bot
+from simulation import SIMULATION_CREDENTIALS, FakeOpenRouter, FakeTwitterClient, SimulatedClock
+from twitter_bot import TwitterBot
+
+START = 1767225600
+
+@pytest.fixture
+def sim_clock():
+    """A SimulatedClock starting at START, installed as the bot's clock for the test."""
+    sim_clock = SimulatedClock(START, START + 30 * 86400)
+    previous = twitter_bot.set_clock(sim_clock)
+    yield sim_clock
+    twitter_bot.set_clock(previous)
+
+@pytest.fixture
+def make_bot(sim_clock, tmp_path):
+    """Build a non-threaded TwitterBot on the fakes; returns (bot, fake twitter client).
+
+    Called with the config keys to set and any FakeTwitterClient arguments. Arrivals default to none,
+    so a test adds exactly the tweets it needs.
+    """
+    bots = []
+
+    def build(config: dict = None, **twitter_args):
+        config_file = tmp_path / f"config{len(bots)}.json"
+        config_file.write_text(json.dumps({
+            **SIMULATION_CREDENTIALS,
+            'state_db_path': str(tmp_path / 'state.db'),
+            'fact_pool_file': str(tmp_path / 'fact_pool.json'),
+            **(config or {})
+        }))
+        rng = random.Random(0)
+        twitter_args = {'mentions_per_hour': 0, 'thread_replies_per_hour': 0, 'posts_per_hour': 0, **twitter_args}
+        twitter = FakeTwitterClient(sim_clock, rng, **twitter_args)
+        bot = TwitterBot(str(config_file), twitter_api=twitter, openrouter=FakeOpenRouter(sim_clock, rng),
+                         threaded=False)
+        bots.append(bot)
+        return bot, twitter
+
+    yield build
+    for bot in bots:
+        bot.state.close()
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Simulation harness for the Twitter bot.
+Drives TwitterBot.run_scheduler on a virtual clock against in-memory fakes of the Twitter
+and OpenRouter APIs, so days of scheduling run in seconds of wall time. The report covers
+throughput, quota use, rate limiting and mention reply latency for a given config.
+"""
+
+import argparse
+import datetime
+import heapq
+import itertools
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import types
+from collections import Counter
+
+import schedule
+import tweepy
+
+import twitter_bot
+from twitter_bot import RateLimitExceeded, TwitterBot
+
+BOT_USER_ID = 1
+BOT_USERNAME = 'simbot'
+
+# Placeholder credentials; the fakes never look at them
+SIMULATION_CREDENTIALS = {
+    'openrouter_api_key': 'simulated',
+    'twitter_bearer_token': 'simulated',
+    'twitter_consumer_key': 'simulated',
+    'twitter_consumer_secret': 'simulated',
+    'twitter_access_token': 'simulated',
+    'twitter_access_token_secret': 'simulated'
+}
+
+class SimulationComplete(Exception):
+    """Raised by the simulated clock once the simulated period is over."""
+
+class SimulatedClock(twitter_bot.Clock):
+    """Virtual clock; sleeping hands control to the simulation instead of blocking."""
+
+    def __init__(self, start: float, end: float):
+        self.current = start
+        self.end = end
+        self.on_sleep = None  # Called with the target time to run work due before it
+
+    def time(self) -> float:
+        return self.current
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.current, datetime.timezone.utc)
+
+    def advance(self, seconds: float):
+        """Move time forward, e.g. by the latency of a fake API call."""
+        self.current += max(seconds, 0)
+
+    def advance_to(self, timestamp: float):
+        self.current = max(self.current, timestamp)
+
+    def sleep(self, seconds: float):
+        target = self.current + seconds
+        if self.on_sleep:
+            self.on_sleep(target)
+        self.advance_to(target)
+        if self.current >= self.end:
+            raise SimulationComplete()
+
+class ScheduleDatetime(datetime.datetime):
+    """datetime whose now() follows the bot's clock, so `schedule` runs on simulated time."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fromtimestamp(twitter_bot.clock.time(), tz)
+
+def isoformat(timestamp: float) -> str:
+    """Format a timestamp the way the Twitter API does."""
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+class FakeTwitterClient:
+    """In-memory stand-in for the tweepy.Client methods the bot uses.
+
+    Tweets arrive as Poisson processes: mentions of the bot, replies to the bot's replies, timeline
+    posts from target users and posts matching search keywords. Every call costs a random latency
+    and counts against a per-endpoint window. An exhausted window raises RateLimitExceeded, as
+    RateLimitedClient does on a 429.
+    """
+
+    # Per-endpoint (requests, window seconds), after the v2 API's user-context limits
+    RATE_LIMITS = {
+        'GET /2/users/me': (75, 900),
+        'GET /2/users/:id/mentions': (180, 900),
+        'GET /2/users/:id/tweets': (900, 900),
+        'GET /2/users/by': (900, 900),
+        'GET /2/tweets': (900, 900),
+        'GET /2/tweets/search/recent': (180, 900),
+        'POST /2/tweets': (100, 900),
+        'POST /2/users/:id/likes': (50, 900),
+        'POST /2/users/:id/retweets': (50, 900)
+    }
+
+    def __init__(self, clock: SimulatedClock, rng: random.Random, target_usernames: list = (),
+                 keywords: list = (), mentions_per_hour: float = 4, thread_replies_per_hour: float = 1,
+                 posts_per_hour: float = 2, latency: tuple = (0.1, 0.6), rate_limits: dict = None):
+        self.clock = clock
+        self.rng = rng
+        self.latency = latency
+        self.limits = {**self.RATE_LIMITS, **(rate_limits or {})}
+        self.windows = {}  # {endpoint: [window_start, used]}
+        self.tracker = None  # The bot's RateLimitTracker, fed the headers a real response would carry
+
+        self.ids = itertools.count(1000000)
+        self.tweets = {}  # {tweet_id: tweet data dict}
+        self.users = {BOT_USER_ID: {'id': str(BOT_USER_ID), 'name': 'Sim Bot', 'username': BOT_USERNAME}}
+        self.usernames = {BOT_USERNAME: BOT_USER_ID}
+        self.mention_times = {}  # {mention tweet_id: created_at}
+        self.bot_replies = []
+
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.actions = Counter()
+        self.reply_latencies = []
+
+        # Pending arrivals as (time, stream); a stream is ('mention',), ('thread_reply',),
+        # ('timeline', username) or ('search', keyword)
+        self.rates = {('mention',): mentions_per_hour, ('thread_reply',): thread_replies_per_hour}
+        for username in target_usernames:
+            self.add_user(username)
+            self.rates[('timeline', username.lower())] = posts_per_hour
+        for keyword in keywords:
+            self.rates[('search', keyword.lower())] = posts_per_hour
+        self.arrivals = []
+        for stream, rate in self.rates.items():
+            if rate > 0:
+                heapq.heappush(self.arrivals, (clock.time() + rng.expovariate(rate / 3600), stream))
+
+    def add_user(self, username: str) -> int:
+        key = username.lower()
+        if key not in self.usernames:
+            user_id = len(self.users) + 100
+            self.users[user_id] = {'id': str(user_id), 'name': username, 'username': username}
+            self.usernames[key] = user_id
+        return self.usernames[key]
+
+    def random_user(self) -> int:
+        return self.add_user(f"user{self.rng.randrange(500)}")
+
+    def add_tweet(self, text: str, author_id: int, created_at: float, **fields) -> dict:
+        tweet_id = next(self.ids)
+        tweet = {
+            'id': str(tweet_id),
+            'text': text,
+            'author_id': str(author_id),
+            'created_at': created_at,
+            'conversation_id': fields.pop('conversation_id', str(tweet_id)),
+            'edit_history_tweet_ids': [str(tweet_id)],
+            'lang': 'en',
+            **fields
+        }
+        self.tweets[tweet_id] = tweet
+        return tweet
+
+    def generate_until(self, now: float):
+        """Create every tweet due to arrive by now, in arrival order."""
+        while self.arrivals and self.arrivals[0][0] <= now:
+            created_at, stream = heapq.heappop(self.arrivals)
+            heapq.heappush(self.arrivals, (created_at + self.rng.expovariate(self.rates[stream] / 3600), stream))
+
+            if stream[0] == 'mention':
+                tweet = self.add_tweet(f"@{BOT_USERNAME} tell me something", self.random_user(), created_at,
+                                       in_reply_to_user_id=str(BOT_USER_ID))
+                self.mention_times[tweet['id']] = created_at
+            elif stream[0] == 'thread_reply':
+                if not self.bot_replies:
+                    continue
+                replied_to = self.tweets[int(self.rng.choice(self.bot_replies))]
+                tweet = self.add_tweet(f"@{BOT_USERNAME} really?", self.random_user(), created_at,
+                                       conversation_id=replied_to['conversation_id'],
+                                       in_reply_to_user_id=str(BOT_USER_ID),
+                                       referenced_tweets=[{'type': 'replied_to', 'id': replied_to['id']}])
+                self.mention_times[tweet['id']] = created_at
+            else:
+                kind, name = stream
+                author_id = self.usernames[name] if kind == 'timeline' else self.random_user()
+                self.add_tweet(f"Post about {name}", author_id, created_at, keyword=name,
+                               like_rate=self.rng.lognormvariate(5, 1.2),
+                               retweet_rate=self.rng.lognormvariate(3, 1.2),
+                               reply_rate=self.rng.lognormvariate(2.5, 1.2))
+
+    def request(self, endpoint: str):
+        """Account for one API call: arrivals, rate limits and latency."""
+        now = self.clock.time()
+        self.generate_until(now)
+        if self.tracker:
+            self.tracker.acquire(endpoint)
+
+        limit, window_seconds = self.limits[endpoint]
+        window = self.windows.setdefault(endpoint, [now, 0])
+        if now >= window[0] + window_seconds:
+            window[:] = [now, 0]
+        reset_at = window[0] + window_seconds
+        if window[1] >= limit:
+            self.rate_limited[endpoint] += 1
+            if self.tracker:
+                self.tracker.exhaust(endpoint, reset_at)
+            raise RateLimitExceeded(endpoint, reset_at)
+
+        window[1] += 1
+        self.calls[endpoint] += 1
+        self.clock.advance(self.rng.uniform(*self.latency))
+        if self.tracker:
+            self.tracker.update(endpoint, {
+                'x-rate-limit-limit': limit,
+                'x-rate-limit-remaining': limit - window[1],
+                'x-rate-limit-reset': reset_at
+            })
+
+    def public_metrics(self, tweet: dict) -> dict:
+        """Engagement grows linearly with age at the tweet's own rates."""
+        age_hours = max(self.clock.time() - tweet['created_at'], 0) / 3600
+        return {
+            'like_count': int(tweet.get('like_rate', 0) * age_hours),
+            'retweet_count': int(tweet.get('retweet_rate', 0) * age_hours),
+            'reply_count': int(tweet.get('reply_rate', 0) * age_hours),
+            'quote_count': 0
+        }
+
+    def to_tweet(self, tweet: dict) -> tweepy.Tweet:
+        data = {key: value for key, value in tweet.items()
+                if key not in ('keyword', 'like_rate', 'retweet_rate', 'reply_rate')}
+        data['created_at'] = isoformat(tweet['created_at'])
+        data['public_metrics'] = self.public_metrics(tweet)
+        return tweepy.Tweet(data)
+
+    def tweets_response(self, tweets: list, max_results: int = 100, token=None) -> tweepy.Response:
+        """Page a newest-first list of tweets with author and referenced-tweet expansions."""
+        start = int(token or 0)
+        page = tweets[start:start + max_results]
+        users = {tweet['author_id'] for tweet in page}
+        referenced = [self.tweets[int(ref['id'])] for tweet in page for ref in tweet.get('referenced_tweets', [])]
+        meta = {'result_count': len(page)}
+        if page:
+            meta.update(newest_id=page[0]['id'], oldest_id=page[-1]['id'])
+        if start + max_results < len(tweets):
+            meta['next_token'] = str(start + max_results)
+        includes = {
+            'users': [tweepy.User(self.users[int(user_id)]) for user_id in users],
+            'tweets': [self.to_tweet(tweet) for tweet in referenced]
+        }
+        return tweepy.Response([self.to_tweet(tweet) for tweet in page] or None, includes, [], meta)
+
+    def visible(self, predicate, since_id=None) -> list:
+        """Tweets created so far that match, newest first."""
+        now = self.clock.time()
+        since = int(since_id or 0)
+        return [tweet for tweet_id, tweet in sorted(self.tweets.items(), reverse=True)
+                if tweet_id > since and tweet['created_at'] <= now and predicate(tweet)]
+
+    # tweepy.Client methods used by the bot
+
+    def get_me(self, **kwargs) -> tweepy.Response:
+        self.request('GET /2/users/me')
+        return tweepy.Response(tweepy.User(self.users[BOT_USER_ID]), {}, [], {})
+
+    def get_users(self, usernames: list = None, **kwargs) -> tweepy.Response:
+        self.request('GET /2/users/by')
+        users = [tweepy.User(self.users[self.usernames[name.lower()]])
+                 for name in usernames or [] if name.lower() in self.usernames]
+        return tweepy.Response(users or None, {}, [], {})
+
+    def get_users_mentions(self, id, since_id=None, max_results=100, pagination_token=None, **kwargs):
+        self.request('GET /2/users/:id/mentions')
+        mentions = self.visible(lambda tweet: tweet['id'] in self.mention_times, since_id)
+        return self.tweets_response(mentions, max_results, pagination_token)
+
+    def get_users_tweets(self, id, since_id=None, max_results=100, pagination_token=None, **kwargs):
+        self.request('GET /2/users/:id/tweets')
+        tweets = self.visible(lambda tweet: tweet['author_id'] == str(id) and 'keyword' in tweet, since_id)
+        return self.tweets_response(tweets, max_results, pagination_token)
+
+    def search_recent_tweets(self, query: str, since_id=None, next_token=None, max_results=100, **kwargs):
+        self.request('GET /2/tweets/search/recent')
+        week_ago = self.clock.time() - 7 * 86400
+        if query.startswith('conversation_id:'):
+            conversation_id = query.split(':', 1)[1].split()[0]
+            matches = lambda tweet: tweet['conversation_id'] == conversation_id
+        else:
+            matches = lambda tweet: tweet.get('keyword', '\0') in query.lower()
+        tweets = self.visible(lambda tweet: tweet['created_at'] >= week_ago and matches(tweet), since_id)
+        return self.tweets_response(tweets, max_results, next_token)
+
+    def get_tweets(self, ids, **kwargs) -> tweepy.Response:
+        self.request('GET /2/tweets')
+        ids = ids if isinstance(ids, (list, tuple)) else str(ids).split(',')
+        tweets = [self.tweets[int(tweet_id)] for tweet_id in ids if int(tweet_id) in self.tweets]
+        return self.tweets_response(tweets, len(tweets) or 1)
+
+    def create_tweet(self, text: str, in_reply_to_tweet_id=None, **kwargs) -> tweepy.Response:
+        self.request('POST /2/tweets')
+        now = self.clock.time()
+        fields = {}
+        if in_reply_to_tweet_id:
+            replied_to = self.tweets[int(in_reply_to_tweet_id)]
+            fields = {'conversation_id': replied_to['conversation_id'],
+                      'referenced_tweets': [{'type': 'replied_to', 'id': replied_to['id']}]}
+        tweet = self.add_tweet(text, BOT_USER_ID, now, **fields)
+
+        if in_reply_to_tweet_id:
+            self.actions['reply'] += 1
+            self.bot_replies.append(tweet['id'])
+            mentioned_at = self.mention_times.get(str(in_reply_to_tweet_id))
+            if mentioned_at is not None:
+                self.reply_latencies.append(now - mentioned_at)
+        else:
+            self.actions['post'] += 1
+        return tweepy.Response({'id': tweet['id'], 'text': text}, {}, [], {})
+
+    def like(self, tweet_id, **kwargs) -> tweepy.Response:
+        self.request('POST /2/users/:id/likes')
+        self.actions['like'] += 1
+        return tweepy.Response({'liked': True}, {}, [], {})
+
+    def retweet(self, tweet_id, **kwargs) -> tweepy.Response:
+        self.request('POST /2/users/:id/retweets')
+        self.actions['retweet'] += 1
+        return tweepy.Response({'retweeted': True}, {}, [], {})
+
+class FakeOpenRouter:
+    """Stand-in for OpenRouterClient with a random latency and a requests-per-minute limit."""
+
+    def __init__(self, clock: SimulatedClock, rng: random.Random, latency: tuple = (0.8, 3.0),
+                 requests_per_minute: int = 20):
+        self.clock = clock
+        self.rng = rng
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.recent = []  # Request times within the last minute
+        self.calls = 0
+        self.rate_limited = 0
+
+    def complete(self, prompt: str, temperature: float = 0.7, max_tokens: int = 150):
+        now = self.clock.time()
+        self.recent = [sent_at for sent_at in self.recent if sent_at > now - 60]
+        if len(self.recent) >= self.requests_per_minute:
+            # The real client logs the 429 and returns None
+            self.rate_limited += 1
+            return None
+
+        self.recent.append(now)
+        self.calls += 1
+        self.clock.advance(self.rng.uniform(*self.latency))
+        return f"Simulated fact number {self.calls}."
+
+    def close(self):
+        pass
+
+class Simulation:
+    """Run the bot's scheduler for a simulated period and report what it did."""
+
+    def __init__(self, config: dict, days: float = 1, seed: int = 0, start: float = 1767225600,
+                 mentions_per_hour: float = 4, thread_replies_per_hour: float = 1, posts_per_hour: float = 2,
+                 twitter_latency: tuple = (0.1, 0.6), llm_latency: tuple = (0.8, 3.0),
+                 llm_requests_per_minute: int = 20, twitter_rate_limits: dict = None):
+        self.config = config
+        self.days = days
+        self.seed = seed
+        self.start = start
+        self.traffic = {
+            'mentions_per_hour': mentions_per_hour,
+            'thread_replies_per_hour': thread_replies_per_hour,
+            'posts_per_hour': posts_per_hour,
+            'latency': twitter_latency,
+            'rate_limits': twitter_rate_limits
+        }
+        self.llm = {'latency': llm_latency, 'requests_per_minute': llm_requests_per_minute}
+
+    def run(self) -> dict:
+        rng = random.Random(self.seed)
+        clock = SimulatedClock(self.start, self.start + self.days * 86400)
+        targets = list(self.config.get('target_twitter_usernames', []))
+        if self.config.get('target_twitter_username'):
+            targets.append(self.config['target_twitter_username'])
+        twitter = FakeTwitterClient(
+            clock, rng,
+            target_usernames=targets,
+            keywords=self.config.get('search_keywords', ['trending']) if self.config.get('search_all_users') else [],
+            **self.traffic
+        )
+        openrouter = FakeOpenRouter(clock, rng, **self.llm)
+
+        # The bot draws prompts and reply chances from the global generator
+        random_state = random.getstate()
+        random.seed(self.seed)
+        previous_clock = twitter_bot.set_clock(clock)
+        schedule_datetime = schedule.datetime
+        schedule.datetime = types.SimpleNamespace(datetime=ScheduleDatetime, timedelta=datetime.timedelta,
+                                                  time=datetime.time, date=datetime.date)
+        schedule.clear()
+        wall_start = time.perf_counter()
+
+        with tempfile.TemporaryDirectory() as workdir:
+            config_file = os.path.join(workdir, 'config.json')
+            with open(config_file, 'w') as f:
+                json.dump({
+                    **SIMULATION_CREDENTIALS,
+                    **self.config,
+                    'state_db_path': os.path.join(workdir, 'bot_state.db'),
+                    'fact_pool_file': os.path.join(workdir, 'fact_pool.json')
+                }, f)
+
+            bot = None
+            try:
+                bot = TwitterBot(config_file, twitter_api=twitter, openrouter=openrouter, threaded=False)
+                twitter.tracker = bot.rate_limits
+                clock.on_sleep = lambda until: self.run_until(bot, clock, until)
+                bot.run_scheduler()
+            except SimulationComplete:
+                pass
+            finally:
+                twitter_bot.set_clock(previous_clock)
+                random.setstate(random_state)
+                schedule.datetime = schedule_datetime
+                schedule.clear()
+                if bot:
+                    bot.openrouter.close()
+                    bot.state.close()
+
+        return self.report(bot, twitter, openrouter, time.perf_counter() - wall_start)
+
+    @staticmethod
+    def run_ready(bot: TwitterBot):
+        """Run queued jobs, LLM calls and due writes until nothing more is ready."""
+        while (bot.mention_executor.run_next(timeout=0) or bot.job_executor.run_next(timeout=0)
+               or bot.llm_executor.run_next(timeout=0) or bot.action_queue.run_next(timeout=0)):
+            pass
+
+    def run_until(self, bot: TwitterBot, clock: SimulatedClock, until: float):
+        """Run work as it comes due, jumping the clock between paced writes, up to until."""
+        while True:
+            self.run_ready(bot)
+            due = bot.action_queue.next_due()
+            if due is None or due >= until:
+                return
+            clock.advance_to(due)
+
+    def report(self, bot: TwitterBot, twitter: FakeTwitterClient, openrouter: FakeOpenRouter,
+               wall_seconds: float) -> dict:
+        latencies = sorted(twitter.reply_latencies)
+        duration = self.days * 86400
+        quota_use = {}
+        for action, (limit, window) in bot.action_queue.quotas.items():
+            quota_use[action] = round(twitter.actions[action] / (limit * duration / window), 4)
+
+        return {
+            'simulated_days': self.days,
+            'wall_seconds': round(wall_seconds, 2),
+            'mentions_received': len(twitter.mention_times),
+            'mentions_replied': len(latencies),
+            'reply_latency_seconds': {
+                'mean': round(statistics.mean(latencies), 1) if latencies else None,
+                'p50': round(latencies[len(latencies) // 2], 1) if latencies else None,
+                'p95': round(latencies[int(len(latencies) * 0.95)], 1) if latencies else None,
+                'max': round(latencies[-1], 1) if latencies else None
+            },
+            'actions': dict(twitter.actions),
+            'quota_use': quota_use,
+            'api_calls': dict(twitter.calls),
+            'rate_limited': dict(twitter.rate_limited),
+            'llm_calls': openrouter.calls,
+            'llm_rate_limited': openrouter.rate_limited,
+            'queued_actions_left': len(bot.action_queue)
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot's scheduler against simulated Twitter and OpenRouter")
+    parser.add_argument('--config', help='JSON config to simulate; credentials are not needed')
+    parser.add_argument('--days', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mentions-per-hour', type=float, default=4)
+    parser.add_argument('--thread-replies-per-hour', type=float, default=1)
+    parser.add_argument('--posts-per-hour', type=float, default=2)
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+
+    simulation = Simulation(config, days=args.days, seed=args.seed, mentions_per_hour=args.mentions_per_hour,
+                            thread_replies_per_hour=args.thread_replies_per_hour,
+                            posts_per_hour=args.posts_per_hour)
+    print(json.dumps(simulation.run(), indent=2))
+
+if __name__ == "__main__":
+    main()
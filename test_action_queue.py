@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the job executors and the paced, quota-limited ActionQueue
+"""
+
+import logging
+from concurrent.futures import Future
+
+import pytest
+
+from conftest import START
+from twitter_bot import (PRIORITY_DAILY_POST, PRIORITY_MENTION, PRIORITY_POPULAR_POSTS, ActionQueue,
+                         ActionSkipped, PriorityExecutor, RateLimitExceeded)
+
+logging.disable(logging.INFO)
+
+def test_executor_runs_the_highest_priority_first_and_fifo_within_one():
+    """Mentions overtake queued popular-post work and the daily post; equal priorities keep their order."""
+    executor = PriorityExecutor(max_workers=0)
+    ran = []
+    executor.submit(ran.append, 'daily post', priority=PRIORITY_DAILY_POST)
+    executor.submit(ran.append, 'popular 1', priority=PRIORITY_POPULAR_POSTS)
+    executor.submit(ran.append, 'popular 2', priority=PRIORITY_POPULAR_POSTS)
+    failed = executor.submit(lambda: 1 / 0, priority=PRIORITY_POPULAR_POSTS)
+    executor.submit(ran.append, 'mention', priority=PRIORITY_MENTION)
+
+    while executor.run_next(timeout=0):
+        pass
+    assert ran == ['mention', 'popular 1', 'popular 2', 'daily post']
+    assert isinstance(failed.exception(), ZeroDivisionError)
+    assert len(executor) == 0
+
+def test_mention_checks_do_not_queue_behind_popular_post_discovery(make_bot):
+    """A mention check submitted while discovery is queued or running goes to its own worker."""
+    bot, twitter = make_bot({'reply_to_mentions': True, 'interact_with_popular_posts': True})
+    bot.submit_job(bot.check_and_interact_with_popular_posts)
+    bot.submit_job(bot.check_and_reply_to_mentions)
+
+    assert len(bot.job_executor) == 1
+    assert bot.mention_executor.run_next(timeout=0)
+    assert twitter.calls['GET /2/users/:id/mentions'] == 1
+    assert len(bot.job_executor) == 1
+
+def test_quota_defers_actions_until_the_window_slides(sim_clock):
+    """A third like waits until the first of two allowed per window expires."""
+    queue = ActionQueue({'like': (2, 900)}, min_interval_seconds=0)
+    liked = []
+    for tweet_id in ('1', '2', '3'):
+        queue.enqueue('like', liked.append, tweet_id, key=f"{tweet_id}:like")
+
+    assert queue.run_next(timeout=0)
+    assert queue.run_next(timeout=0)
+    assert not queue.run_next(timeout=0)
+    assert liked == ['1', '2']
+    assert queue.next_due() == START + 900
+
+    sim_clock.advance_to(START + 900)
+    assert queue.run_next(timeout=0)
+    assert liked == ['1', '2', '3']
+
+def test_action_waits_for_its_input():
+    """An action runs only once its input future resolves, with the result as its last argument."""
+    queue = ActionQueue({}, min_interval_seconds=0)
+    replies = []
+    generated = Future()
+    future = queue.enqueue('reply', lambda tweet_id, text: replies.append((tweet_id, text)) or True, '7',
+                           after=generated)
+
+    assert not queue.run_next(timeout=0)
+    generated.set_result('A fact')
+    assert queue.run_next(timeout=0)
+    assert replies == [('7', 'A fact')]
+    assert future.result() is True
+
+def test_rate_limited_write_is_retried_after_reset(sim_clock):
+    """A write the API rate limits goes back to the head of its queue without using quota."""
+    queue = ActionQueue({'like': (5, 900)}, min_interval_seconds=0)
+    attempts = []
+
+    def like(tweet_id):
+        attempts.append(tweet_id)
+        if len(attempts) == 1:
+            raise RateLimitExceeded('POST /2/users/:id/likes', reset_at=START + 60)
+        return True
+
+    future = queue.enqueue('like', like, '1', key='1:like')
+    assert queue.run_next(timeout=0)
+    assert not future.done()
+    assert not queue.sent.get('like')
+    assert not queue.run_next(timeout=0)
+
+    sim_clock.advance_to(START + 60)
+    assert queue.run_next(timeout=0)
+    assert future.result() is True
+    assert attempts == ['1', '1']
+    assert len(queue.sent['like']) == 1
+
+def test_failed_input_resolves_without_using_quota():
+    """An action whose input future failed is dropped once instead of being requeued forever."""
+    queue = ActionQueue({'reply': (1, 900)}, min_interval_seconds=0)
+    calls = []
+    generated = Future()
+    generated.set_exception(RateLimitExceeded('tweets', reset_at=0))
+    future = queue.enqueue('reply', calls.append, key='reply:1', after=generated)
+
+    assert queue.run_next(timeout=0)
+    assert isinstance(future.exception(), RateLimitExceeded)
+    assert calls == []
+    assert queue.pending('reply:1') is None
+    assert not queue.sent.get('reply')
+    assert not queue.run_next(timeout=0)
+
+def test_skipped_action_resolves_without_using_quota():
+    """An action that decides not to write resolves with None and leaves the quota and pacing untouched."""
+    queue = ActionQueue({'reply': (1, 900)}, min_interval_seconds=60)
+
+    def skip():
+        raise ActionSkipped("too deep")
+
+    skipped = queue.enqueue('reply', skip, key='reply:1')
+    posted = queue.enqueue('reply', lambda: True, key='reply:2')
+
+    assert queue.run_next(timeout=0)
+    assert skipped.result() is None
+    assert queue.run_next(timeout=0)
+    assert posted.result() is True
+    assert len(queue.sent['reply']) == 1
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded caches and the persistent action and user records
+"""
+
+import logging
+import types
+
+import pytest
+
+from conftest import START
+from twitter_bot import ActionLedger, BloomFilter, BoundedCache, ConversationIndex, StateStore, UserDirectory
+
+logging.disable(logging.INFO)
+
+class FakeUsersClient:
+    """Answers users/by lookups for usernames starting with 'user', counting requests."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get_users(self, usernames, **kwargs):
+        self.requests.append(list(usernames))
+        return types.SimpleNamespace(data=[types.SimpleNamespace(id=1000 + int(name[4:]), username=name)
+                                           for name in usernames if name.startswith('user')])
+
+def test_bounded_cache_evicts_least_recently_used():
+    """Past max_entries the entry touched longest ago goes, and a read counts as a touch."""
+    cache = BoundedCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert 'b' not in cache
+    assert cache.values() == [1, 3]
+    assert cache.evicted_by_size == 1
+
+def test_bounded_cache_expires_idle_entries(sim_clock):
+    cache = BoundedCache(max_age_seconds=60)
+    cache.put('a', 1)
+    sim_clock.advance(30)
+    cache.put('b', 2)
+    sim_clock.advance(45)
+
+    assert 'a' not in cache
+    assert cache.get('b') == 2
+    assert cache.evicted_by_age == 1
+
+def test_conversation_depth_survives_eviction_and_restart(sim_clock, tmp_path):
+    """An evicted or reloaded conversation keeps counting the bot replies already stored for it."""
+    state = StateStore(str(tmp_path / 'state.db'))
+
+    def bot_reply(tweet_id):
+        sim_clock.advance(60)
+        return {'id': tweet_id, 'in_reply_to': 'a', 'timestamp': sim_clock.now(), 'is_bot_reply': True}
+
+    index = ConversationIndex(max_conversations=1, count_bot_replies=state.count_bot_replies)
+    for tweet_id in ('a1', 'a2'):
+        index.add_reply('a', bot_reply(tweet_id))
+        state.add_chain_reply('a', bot_reply(tweet_id))
+    index.start('b')
+    assert 'a' not in index
+    assert index.bot_depth('a') == 2
+
+    index.add_reply('a', bot_reply('a3'))
+    state.add_chain_reply('a', bot_reply('a3'))
+    assert index.bot_depth('a') == 3
+    assert index.children('a', 'a') == ['a3']
+
+    restored = ConversationIndex.from_chains(state.load_reply_chains(), count_bot_replies=state.count_bot_replies)
+    assert restored.bot_depth('a') == 3
+    assert restored.children('a', 'a') == ['a1', 'a2', 'a3']
+    state.close()
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(expected_items=1000)
+    keys = [f"{tweet_id}:like" for tweet_id in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    assert sum(f"{tweet_id}:retweet" in bloom for tweet_id in range(1000)) < 50
+
+def test_action_ledger_survives_a_restart(tmp_path):
+    state = StateStore(str(tmp_path / 'state.db'))
+    ActionLedger(state).record('42', 'like')
+    state.close()
+
+    state = StateStore(str(tmp_path / 'state.db'))
+    ledger = ActionLedger(state)
+    assert ledger.has('42', 'like')
+    assert not ledger.has('42', 'retweet')
+    assert not ledger.has('43', 'like')
+    state.close()
+
+def test_user_directory_resolves_in_batches_until_the_ttl_expires(sim_clock, tmp_path):
+    """Missing usernames are looked up 100 per request, then served from the cache until they expire."""
+    state = StateStore(str(tmp_path / 'state.db'))
+    client = FakeUsersClient()
+    users = UserDirectory(state, client, ttl_seconds=3600)
+    usernames = [f"user{n}" for n in range(150)] + ['ghost']
+
+    resolved = users.resolve(usernames)
+    assert [len(batch) for batch in client.requests] == [100, 51]
+    assert len(resolved) == 150 and 'ghost' not in resolved
+    assert resolved['user7'] == '1007'
+
+    assert users.resolve(['USER7']) == {'USER7': '1007'}
+    assert len(client.requests) == 2
+
+    sim_clock.advance(3600)
+    users.resolve(['user7'])
+    assert client.requests[-1] == ['user7']
+    state.close()
+
+def test_reply_chains_load_only_recent_conversations_and_expire_on_disk(sim_clock, tmp_path):
+    """A restart reads the most recently active conversations; expired ones are deleted with their replies."""
+    state = StateStore(str(tmp_path / 'state.db'))
+    for conversation_id in ('1', '2', '3'):
+        state.save_conversation(conversation_id, {'id': conversation_id})
+        state.add_chain_reply(conversation_id, {'id': f"{conversation_id}0", 'in_reply_to': conversation_id,
+                                                'timestamp': sim_clock.now(), 'is_bot_reply': True})
+        state.add_bot_tweet(f"{conversation_id}0", conversation_id)
+        sim_clock.advance(86400)
+
+    assert sorted(state.load_reply_chains(limit=2)) == ['2', '3']
+    assert sorted(state.load_reply_chains(since=START + 86400)) == ['2', '3']
+    assert state.load_reply_chains()['1']['replies'][0]['id'] == '10'
+
+    state.delete_expired(conversations_before=START + 86400, bot_tweets_before=START + 2 * 86400)
+    assert sorted(state.load_reply_chains()) == ['2', '3']
+    assert state.count_bot_replies('1') == 0
+    assert [tweet_id for tweet_id, _ in state.load_bot_tweets()] == ['30']
+    state.close()
+
+def test_identity_is_cached_per_access_token(make_bot):
+    """users/me is called once per set of credentials, not on every start."""
+    bot, twitter = make_bot()
+    assert (bot.user_id, bot.username) == ('1', 'simbot')
+    assert twitter.calls['GET /2/users/me'] == 1
+
+    restarted, twitter = make_bot()
+    assert (restarted.user_id, restarted.username) == ('1', 'simbot')
+    assert twitter.calls['GET /2/users/me'] == 0
+
+    switched, twitter = make_bot({'twitter_access_token': 'another account'})
+    assert switched.identity_fingerprint() != bot.identity_fingerprint()
+    assert twitter.calls['GET /2/users/me'] == 1
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
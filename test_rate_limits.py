@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for per-endpoint rate limit tracking and the fail-fast tweepy client
+"""
+
+import json
+import logging
+
+import pytest
+import requests
+
+from conftest import START
+from twitter_bot import RateLimitedClient, RateLimitExceeded, RateLimitTracker
+
+logging.disable(logging.INFO)
+
+class FakeSession:
+    """Hands out canned responses in order, counting the requests that reached it."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append(f"{method} {url}")
+        return self.responses.pop(0)
+
+def response(status_code: int, body: dict, **headers) -> requests.Response:
+    result = requests.Response()
+    result.status_code = status_code
+    result.reason = 'OK' if status_code == 200 else 'Too Many Requests'
+    result.headers.update({name.replace('_', '-'): str(value) for name, value in headers.items()})
+    result._content = json.dumps(body).encode()
+    return result
+
+def test_endpoint_key_collapses_ids_and_usernames():
+    assert RateLimitTracker.endpoint_key('GET', '/2/users/12/mentions') == 'GET /2/users/:id/mentions'
+    assert RateLimitTracker.endpoint_key('GET', '/2/users/by/username/nasa') == 'GET /2/users/by/username/:username'
+    assert RateLimitTracker.endpoint_key('POST', '/2/tweets') == 'POST /2/tweets'
+
+def test_tracker_spends_the_reported_budget_and_refills_at_reset(sim_clock):
+    """Headers set the budget; an empty bucket raises until its reset time, then lets requests through again."""
+    tracker = RateLimitTracker()
+    endpoint = 'GET /2/users/:id/mentions'
+    tracker.acquire(endpoint)  # Unknown endpoints are never held back
+
+    tracker.update(endpoint, {'x-rate-limit-limit': '3', 'x-rate-limit-remaining': '1',
+                              'x-rate-limit-reset': str(START + 900)})
+    tracker.acquire(endpoint)
+    with pytest.raises(RateLimitExceeded) as raised:
+        tracker.acquire(endpoint)
+    assert raised.value.reset_at == START + 900
+    assert raised.value.retry_after() == 900
+
+    sim_clock.advance_to(START + 900)
+    tracker.acquire(endpoint)
+    assert tracker.buckets[endpoint]['remaining'] == 2
+
+def test_client_fails_fast_after_a_429_until_the_reset(sim_clock):
+    """A 429 exhausts only its endpoint, and later calls raise without reaching the network."""
+    tracker = RateLimitTracker()
+    client = RateLimitedClient(bearer_token='token', rate_limits=tracker)
+    client.session = FakeSession(
+        response(200, {'data': {'id': '12', 'name': 'NASA', 'username': 'nasa'}},
+                 x_rate_limit_limit=300, x_rate_limit_remaining=299, x_rate_limit_reset=START + 900),
+        response(429, {'title': 'Too Many Requests'}, x_rate_limit_reset=START + 600),
+        response(200, {'data': {'id': '12', 'name': 'NASA', 'username': 'nasa'}})
+    )
+
+    assert client.get_user(id=12).data.username == 'nasa'
+    assert tracker.buckets['GET /2/users/:id']['remaining'] == 299
+
+    with pytest.raises(RateLimitExceeded) as raised:
+        client.get_user(id=12)
+    assert raised.value.endpoint == 'GET /2/users/:id'
+    assert raised.value.reset_at == START + 600
+
+    with pytest.raises(RateLimitExceeded):
+        client.get_user(id=12)
+    assert len(client.session.requests) == 2
+
+    sim_clock.advance_to(START + 600)
+    assert client.get_user(id=12).data.id == 12
+    assert len(client.session.requests) == 3
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
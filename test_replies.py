@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Tests for the fact pool, parsing batched facts, routing mentions and advancing the mention cursor
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from conftest import START
+from simulation import BOT_USER_ID, Simulation
+from twitter_bot import FactPool, RateLimitExceeded, StateStore, TwitterBot
+
+logging.disable(logging.INFO)
+
+def test_parse_fact_batch_keeps_only_usable_facts():
+    """The JSON list is found inside surrounding chatter; blanks, non-strings and long items are dropped."""
+    content = 'Here you go:\n["Octopuses have three hearts. ", "", 42, "' + 'x' * 300 + '", "Honey never spoils."]'
+
+    assert TwitterBot.parse_fact_batch(content, max_length=250) == [
+        "Octopuses have three hearts.", "Honey never spoils."]
+    assert TwitterBot.parse_fact_batch("No list here", max_length=250) == []
+    assert TwitterBot.parse_fact_batch("[not json]", max_length=250) == []
+
+def test_fact_pool_refills_in_batches_and_survives_a_restart(tmp_path):
+    """Refills top each category up to capacity in batch-sized calls; what is left is reloaded from disk."""
+    requested = []
+
+    def generate(count):
+        requested.append(count)
+        return [f"Fact {len(requested)}.{n}" for n in range(count)]
+
+    path = str(tmp_path / 'fact_pool.json')
+    pool = FactPool(path, {'statement': generate, 'reply': lambda count: []}, capacity=4, low_water=2, batch_size=3)
+    pool.refill()
+    assert requested == [3, 1]
+    assert pool.sizes() == {'statement': 4, 'reply': 0}
+
+    assert pool.pop('statement') == "Fact 1.0"
+    assert pool.pop('statement') == "Fact 1.1"
+    assert not pool.refill_needed.is_set()
+    assert pool.pop('statement') == "Fact 1.2"
+    assert pool.refill_needed.is_set()
+    assert pool.pop('reply') is None
+
+    restarted = FactPool(path, {'statement': generate, 'reply': lambda count: []}, capacity=4)
+    assert restarted.sizes() == {'statement': 1, 'reply': 0}
+    assert restarted.pop('statement') == "Fact 2.0"
+
+def test_mention_cursor_only_passes_finished_replies(tmp_path):
+    """The cursor stops before the oldest reply still queued and catches up once it finishes."""
+    bot = object.__new__(TwitterBot)
+    bot.state = StateStore(str(tmp_path / 'state.db'))
+    bot.cursor_lock = threading.Lock()
+    bot.last_mention_id = None
+
+    done, queued = Future(), Future()
+    done.set_result(True)
+    handled = [('101', done), ('102', queued), ('103', None)]
+
+    bot.advance_mention_cursor(handled)
+    assert bot.last_mention_id == '101'
+
+    queued.set_result(True)
+    bot.advance_mention_cursor(handled, queued)
+    assert bot.last_mention_id == '103'
+    assert bot.state.get_cursor('last_mention_id') == '103'
+
+    # A late callback from an older batch never moves the cursor back
+    bot.advance_mention_cursor([('99', done)], done)
+    assert bot.last_mention_id == '103'
+    bot.state.close()
+
+def test_mention_cursor_holds_at_a_rate_limited_reply(tmp_path):
+    """A reply whose generation hit a rate limit keeps the cursor before it so the mention is fetched again."""
+    bot = object.__new__(TwitterBot)
+    bot.state = StateStore(str(tmp_path / 'state.db'))
+    bot.cursor_lock = threading.Lock()
+    bot.last_mention_id = None
+
+    done, limited = Future(), Future()
+    done.set_result(True)
+    limited.set_exception(RateLimitExceeded('GET /2/tweets/search/recent', reset_at=0))
+
+    bot.advance_mention_cursor([('101', done), ('102', limited), ('103', done)], limited)
+    assert bot.last_mention_id == '101'
+    bot.state.close()
+
+def test_thread_replies_in_one_check_respect_the_depth_limit(sim_clock, make_bot):
+    """Several replies in one conversation fetched together get no more bot replies than the depth limit."""
+    bot, twitter = make_bot({'reply_to_replies': True, 'track_reply_chains': True, 'max_reply_chain_depth': 2})
+
+    bot_tweet = twitter.add_tweet("A fact", BOT_USER_ID, START)
+    bot.bot_replies.add(bot_tweet['id'])
+    for _ in range(4):
+        reply = twitter.add_tweet("@simbot really?", twitter.random_user(), START,
+                                  conversation_id=bot_tweet['conversation_id'],
+                                  referenced_tweets=[{'type': 'replied_to', 'id': bot_tweet['id']}])
+        twitter.mention_times[reply['id']] = START
+
+    bot.check_and_reply_to_mentions()
+    Simulation({}).run_until(bot, sim_clock, START + 3600)
+
+    assert twitter.actions['reply'] == 2
+    assert bot.conversations.bot_depth(bot_tweet['conversation_id']) == 2
+
+def test_thread_reply_reuses_the_mention_expansions(sim_clock, make_bot):
+    """Replying to a reply to the bot needs no extra tweet lookup; the mentions response carries the thread."""
+    bot, twitter = make_bot({'reply_to_replies': True})
+    prompts = []
+    complete = bot.openrouter.complete
+    bot.openrouter.complete = lambda prompt, **kwargs: prompts.append(prompt) or complete(prompt, **kwargs)
+
+    bot_tweet = twitter.add_tweet("Octopuses have three hearts.", BOT_USER_ID, START)
+    bot.bot_replies.add(bot_tweet['id'])
+    reply = twitter.add_tweet("@simbot really?", twitter.random_user(), START,
+                              conversation_id=bot_tweet['conversation_id'],
+                              referenced_tweets=[{'type': 'replied_to', 'id': bot_tweet['id']}])
+    twitter.mention_times[reply['id']] = START
+
+    bot.check_and_reply_to_mentions()
+    Simulation({}).run_until(bot, sim_clock, START + 600)
+
+    assert twitter.actions['reply'] == 1
+    assert twitter.calls['GET /2/tweets'] == 0
+    assert "Octopuses have three hearts." in prompts[0]
+
+def add_mentions(twitter, count: int) -> list:
+    """Add mentions of the bot from different users and return their IDs."""
+    mention_ids = []
+    for _ in range(count):
+        mention = twitter.add_tweet("@simbot tell me something", twitter.random_user(), START,
+                                    in_reply_to_user_id=str(BOT_USER_ID))
+        twitter.mention_times[mention['id']] = START
+        mention_ids.append(mention['id'])
+    return mention_ids
+
+def test_failed_generation_writes_nothing_and_uses_no_quota(sim_clock, make_bot):
+    """Mentions whose fact could not be generated are dropped before the pacer counts them."""
+    bot, twitter = make_bot()
+    bot.openrouter.requests_per_minute = 1
+    add_mentions(twitter, 5)
+
+    bot.check_and_reply_to_mentions()
+    Simulation({}).run_until(bot, sim_clock, START + 60)
+
+    assert twitter.actions['reply'] == 1
+    assert len(bot.action_queue.sent['reply']) == 1
+
+def test_mentions_whose_generation_failed_are_answered_by_a_later_check(sim_clock, make_bot):
+    """A failed generation holds the mention cursor, so later checks answer each mention exactly once."""
+    bot, twitter = make_bot()
+    bot.openrouter.requests_per_minute = 1
+    mention_ids = add_mentions(twitter, 5)
+
+    for check in range(1, 6):
+        bot.check_and_reply_to_mentions()
+        Simulation({}).run_until(bot, sim_clock, START + 61 * check)
+        sim_clock.advance_to(START + 61 * check)
+
+    assert twitter.actions['reply'] == 5
+    assert len(twitter.reply_latencies) == 5
+    assert str(bot.last_mention_id) == mention_ids[-1]
+
+def test_thread_context_is_extended_from_the_newest_cached_tweet(sim_clock, make_bot):
+    """A second lookup only searches past the cached tweets and appends what it finds."""
+    bot, twitter = make_bot()
+    searched = []
+    search = twitter.search_recent_tweets
+
+    def search_recent_tweets(query, since_id=None, **kwargs):
+        searched.append(since_id)
+        return search(query, since_id=since_id, **kwargs)
+
+    twitter.search_recent_tweets = search_recent_tweets
+    author = twitter.random_user()
+    root = twitter.add_tweet("Root", author, START)
+    conversation_id = root['conversation_id']
+    first = twitter.add_tweet("First reply", BOT_USER_ID, START, conversation_id=conversation_id)
+    username = twitter.users[author]['username']
+
+    assert bot.get_thread_context(conversation_id) == f"@{username}: Root\n@simbot: First reply"
+
+    twitter.add_tweet("Second reply", author, START, conversation_id=conversation_id)
+    assert bot.get_thread_context(conversation_id) == (
+        f"@{username}: Root\n@simbot: First reply\n@{username}: Second reply")
+    assert bot.get_thread_context(conversation_id).endswith("Second reply")
+    assert searched[:2] == [None, first['id']]
+    assert int(searched[2]) > int(first['id'])
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
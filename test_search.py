@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for packing search keywords into queries and ranking what comes back
+"""
+
+import datetime
+import logging
+
+import pytest
+
+from conftest import START
+from simulation import Simulation
+from twitter_bot import (MIN_VELOCITY_AGE_HOURS, SEARCH_QUERY_FILTERS, CandidateWindow, ResponseIncludes, TopKPosts,
+                         match_keywords, plan_search_queries, score_by_velocity)
+
+logging.disable(logging.INFO)
+
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+def post(tweet_id, hours_old=0):
+    return {'id': tweet_id, 'created_at': NOW - datetime.timedelta(hours=hours_old),
+            'likes': 0, 'retweets': 0, 'replies': 0}
+
+def test_keywords_share_one_query_when_they_fit():
+    """Keywords are OR-combined, with multi-word ones quoted as phrases."""
+    plans = plan_search_queries(['space', 'black holes', 'mars'])
+
+    assert plans == [(f'(space OR "black holes" OR mars) {SEARCH_QUERY_FILTERS}', ['space', 'black holes', 'mars'])]
+
+def test_keywords_split_across_queries_at_the_length_limit():
+    """No query exceeds max_length, and a keyword too long for any query is skipped."""
+    keywords = ['alpha', 'bravo', 'charlie', 'x' * 100]
+    max_length = len(f"(alpha OR bravo) {SEARCH_QUERY_FILTERS}")
+    plans = plan_search_queries(keywords, max_length)
+
+    assert [batch for _, batch in plans] == [['alpha', 'bravo'], ['charlie']]
+    assert all(len(query) <= max_length for query, _ in plans)
+
+def test_match_keywords_ignores_case():
+    assert match_keywords("Photos of MARS from orbit", ['space', 'mars', 'Orbit']) == ['mars', 'Orbit']
+    assert match_keywords("Nothing here", ['space']) == []
+
+def test_velocity_favours_younger_posts_and_floors_the_age():
+    """Engagement per hour ranks a young post above an older one with more likes; brand-new posts aren't inflated."""
+    young = dict(post('young', hours_old=1), likes=300)
+    old = dict(post('old', hours_old=10), likes=1000)
+    assert score_by_velocity(young, {}, NOW) > score_by_velocity(old, {}, NOW)
+
+    weighted = dict(post('weighted', hours_old=2), likes=10, retweets=5, replies=4)
+    assert score_by_velocity(weighted, {}, NOW) == (10 + 2 * 5 + 4) / 2
+    assert score_by_velocity(weighted, {'likes': 2, 'retweets': 0, 'replies': 0}, NOW) == 10
+
+    brand_new = dict(post('new'), likes=100)
+    assert score_by_velocity(brand_new, {}, NOW) == 100 / MIN_VELOCITY_AGE_HOURS
+
+def test_top_k_keeps_the_highest_unique_scores():
+    """Only the k best posts survive, best first, and a repeated ID is counted once."""
+    top = TopKPosts(2)
+    for tweet_id, score in (('a', 1), ('b', 5), ('c', 3), ('b', 9), ('d', 2)):
+        top.push(score, post(tweet_id))
+
+    assert [p['id'] for p in top.results()] == ['b', 'c']
+
+def test_candidate_window_prunes_old_then_overflowing_posts():
+    """Posts past the age threshold go first, then the oldest beyond max_size."""
+    window = CandidateWindow(max_size=2)
+    for tweet_id, hours_old in (('1', 30), ('2', 3), ('3', 2), ('4', 1)):
+        window.add(post(tweet_id, hours_old))
+
+    dropped = window.prune(NOW - datetime.timedelta(hours=24))
+
+    assert dropped == ['1', '2']
+    assert sorted(p['id'] for p in window.candidates()) == ['3', '4']
+
+def test_timeline_pages_back_to_the_cursor(make_bot):
+    """An account that posted more than a page since the last run has every new tweet picked up."""
+    bot, twitter = make_bot(target_usernames=['nasa'])
+    user_id = twitter.usernames['nasa']
+    threshold = NOW - datetime.timedelta(hours=24)
+
+    twitter.add_tweet("Post about nasa", user_id, START, keyword='nasa')
+    bot.fetch_timeline('nasa', user_id, 10, threshold)
+    assert len(bot.candidate_window) == 1
+
+    for _ in range(250):
+        twitter.add_tweet("Post about nasa", user_id, START, keyword='nasa')
+    bot.fetch_timeline('nasa', user_id, 10, threshold)
+
+    assert len(bot.candidate_window) == 251
+    assert twitter.calls['GET /2/users/:id/tweets'] == 4
+
+def test_refresh_drops_candidates_too_slow_to_become_popular(sim_clock, make_bot):
+    """Only young posts and posts liked fast enough to reach the threshold are looked up again."""
+    bot, twitter = make_bot({'popular_posts_min_likes': 1000, 'popular_posts_max_age_hours': 24})
+    sim_clock.advance_to(START + 4 * 3600)
+    # {text: (hours after START it was posted, likes per hour)}
+    posts = {'young': (3.5, 0), 'fast': (0, 100), 'slow': (0, 2.5)}
+    for text, (hours, like_rate) in posts.items():
+        tweet = twitter.add_tweet(text, twitter.random_user(), START + hours * 3600, like_rate=like_rate)
+        bot.add_candidate(bot.post_from_tweet(twitter.to_tweet(tweet), ResponseIncludes(), 'search'),
+                          NOW - datetime.timedelta(hours=24))
+
+    bot.refresh_candidates()
+
+    assert sorted(post['text'] for post in bot.candidate_window.candidates()) == ['fast', 'young']
+    assert twitter.calls['GET /2/tweets'] == 1
+
+def test_rerank_acts_once_on_posts_that_rise_into_the_top(sim_clock, make_bot):
+    """A post that takes off between full runs is liked on the next re-rank, and not queued again after that."""
+    bot, twitter = make_bot({'interact_with_popular_posts': True, 'target_twitter_username': 'nasa',
+                             'popular_posts_interaction_types': ['like'], 'popular_posts_min_likes': 100,
+                             'popular_posts_reply_chance': 0}, target_usernames=['nasa'])
+    tweet = twitter.add_tweet("Post about nasa", twitter.usernames['nasa'], START, keyword='nasa', like_rate=1000)
+    bot.add_candidate(bot.post_from_tweet(twitter.to_tweet(tweet), ResponseIncludes(), '@nasa'),
+                      NOW - datetime.timedelta(hours=24))
+
+    sim_clock.advance_to(START + 3600)
+    bot.rerank_candidates()
+    Simulation({}).run_until(bot, sim_clock, START + 7200)
+    assert twitter.actions['like'] == 1
+
+    bot.rerank_candidates()
+    assert len(bot.job_executor) == 0
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
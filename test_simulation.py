@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Scheduler tests that run the bot against the simulated Twitter and OpenRouter backends
+"""
+
+import logging
+
+import pytest
+
+from simulation import Simulation
+
+logging.disable(logging.INFO)
+
+CONFIG = {
+    'reply_to_mentions': True,
+    'reply_to_replies': True,
+    'track_reply_chains': True,
+    'mention_check_interval_minutes': 5,
+    'interact_with_popular_posts': True,
+    'target_twitter_username': 'nasa',
+    'popular_posts_interaction_types': ['like', 'retweet'],
+    'popular_posts_check_interval_hours': 2
+}
+
+def test_simulated_day_answers_every_mention():
+    """Every mention gets a reply within about one check interval."""
+    report = Simulation(CONFIG, days=1, seed=1).run()
+
+    assert report['mentions_received'] > 0
+    assert report['mentions_replied'] == report['mentions_received']
+    assert report['reply_latency_seconds']['max'] <= 5 * 60 + 60
+    assert report['wall_seconds'] < 60
+
+def test_simulation_is_deterministic():
+    """The same seed reproduces the same run."""
+    first = Simulation(CONFIG, days=0.5, seed=7).run()
+    second = Simulation(CONFIG, days=0.5, seed=7).run()
+
+    first.pop('wall_seconds')
+    second.pop('wall_seconds')
+    assert first == second
+
+def test_action_quotas_are_respected():
+    """Likes never exceed the configured quota, however many candidates turn up."""
+    config = dict(CONFIG, action_quotas={'like': [3, 3600]}, popular_posts_min_likes=10,
+                  search_all_users=True, search_keywords=['space'])
+    report = Simulation(config, days=1, seed=2, posts_per_hour=20).run()
+
+    assert 0 < report['actions']['like'] <= 3 * 24
+    assert report['quota_use']['like'] <= 1
+    assert not report['rate_limited']
+
+def test_thread_replies_survive_an_exhausted_search_window():
+    """Replies to the bot still go out, without thread context, while conversation search is rate limited."""
+    report = Simulation(CONFIG, days=0.5, seed=3,
+                        twitter_rate_limits={'GET /2/tweets/search/recent': (0, 900)}).run()
+
+    assert report['rate_limited']['GET /2/tweets/search/recent'] > 0
+    assert report['mentions_replied'] == report['mentions_received']
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__]))
@@ -6,34 +6,1381 @@ Automatically posts random AI-generated statements to Twitter every 24 hours.
 
 import time
 import json
+import asyncio
+import functools
+import hashlib
+import math
+import os
+import threading
 import logging
 import schedule
 import requests
 import tweepy
 from typing import Optional
 import random
+import sqlite3
 import datetime
+import heapq
+import itertools
+import sys
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('twitter_bot.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+def configure_logging():
+    """Log to twitter_bot.log and the console; called by main() so importing the module writes no files."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('twitter_bot.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+class Clock:
+    """Wall-clock time and sleeps; the simulation harness installs a virtual clock with set_clock()."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def now(self) -> datetime.datetime:
+        """Current time as an aware UTC datetime."""
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+clock = Clock()
+
+def set_clock(new_clock: Clock) -> Clock:
+    """Replace the module clock and return the previous one."""
+    global clock
+    previous, clock = clock, new_clock
+    return previous
+
+SEARCH_QUERY_FILTERS = "-is:retweet -is:reply lang:en"
+# Recent search rejects a since_id older than seven days; give up on cursors a little before that
+SEARCH_CURSOR_MAX_AGE_SECONDS = 7 * 86400 - 3600
+
+def format_search_term(keyword: str) -> str:
+    """Quote multi-word keywords so they are searched as exact phrases."""
+    return f'"{keyword}"' if ' ' in keyword else keyword
+
+def plan_search_queries(keywords: list, max_length: int = 512, filters: str = SEARCH_QUERY_FILTERS) -> list:
+    """Pack keywords into as few '(a OR b) filters' queries as fit under max_length.
+
+    Returns a list of (query, keywords) pairs.
+    """
+    def build(terms):
+        group = terms[0] if len(terms) == 1 else f"({' OR '.join(terms)})"
+        return f"{group} {filters}"
+
+    plans = []
+    batch = []
+    for keyword in keywords:
+        term = format_search_term(keyword)
+        if len(build([term])) > max_length:
+            logger.warning(f"Skipping keyword too long for a search query: {keyword}")
+            continue
+
+        if batch and len(build([format_search_term(k) for k in batch] + [term])) > max_length:
+            plans.append((build([format_search_term(k) for k in batch]), batch))
+            batch = []
+        batch.append(keyword)
+
+    if batch:
+        plans.append((build([format_search_term(k) for k in batch]), batch))
+    return plans
+
+def match_keywords(text: str, keywords: list) -> list:
+    """Return the keywords that appear in a tweet's text, case-insensitively."""
+    lowered = text.lower()
+    return [keyword for keyword in keywords if keyword.lower() in lowered]
+
+# Floor on post age so a brand-new tweet's velocity isn't divided by almost zero
+MIN_VELOCITY_AGE_HOURS = 0.25
+
+def score_by_likes(post: dict, weights: dict, now: datetime.datetime) -> float:
+    """Rank posts by raw like count."""
+    return post['likes']
+
+def score_by_velocity(post: dict, weights: dict, now: datetime.datetime) -> float:
+    """Rank posts by weighted engagement per hour since they were posted."""
+    age_hours = max((now - post['created_at']).total_seconds() / 3600, MIN_VELOCITY_AGE_HOURS)
+    engagement = (
+        weights.get('likes', 1) * post['likes'] +
+        weights.get('retweets', 2) * post['retweets'] +
+        weights.get('replies', 1) * post['replies']
+    )
+    return engagement / age_hours
+
+# Candidates younger than this are always refreshed, however slowly they have started
+CANDIDATE_GRACE_HOURS = 1
+
+def projected_likes(post: dict, max_age_hours: float, now: datetime.datetime) -> float:
+    """Likes a post would have by max_age_hours if it kept its like rate so far."""
+    age_hours = max((now - post['created_at']).total_seconds() / 3600, MIN_VELOCITY_AGE_HOURS)
+    return post['likes'] / age_hours * max_age_hours
+
+POST_SCORERS = {
+    'likes': score_by_likes,
+    'velocity': score_by_velocity
+}
+
+class TopKPosts:
+    """Streaming bounded min-heap keeping the k highest-scoring unique posts."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap = []  # (score, sequence, post); the lowest score is at heap[0]
+        self.seen_ids = set()
+        self.sequence = itertools.count()
+
+    def push(self, score: float, post: dict):
+        """Offer a post; it is kept only while it ranks in the top k."""
+        if post['id'] in self.seen_ids:
+            return
+        self.seen_ids.add(post['id'])
+
+        entry = (score, next(self.sequence), post)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif score > self.heap[0][0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def results(self) -> list:
+        """Return the kept posts, highest score first."""
+        return [post for _, _, post in sorted(self.heap, key=lambda entry: (-entry[0], entry[1]))]
+
+class ResponseIncludes:
+    """Index over a tweepy Response's expansions for O(1) user and tweet lookups."""
+
+    def __init__(self, includes: Optional[dict] = None):
+        includes = includes or {}
+        self.users = {str(user.id): user for user in includes.get('users', [])}
+        self.tweets = {str(tweet.id): tweet for tweet in includes.get('tweets', [])}
+
+    @classmethod
+    def from_response(cls, response) -> 'ResponseIncludes':
+        """Build the index once for an API response."""
+        return cls(getattr(response, 'includes', None))
+
+    def user(self, user_id):
+        """Return an expanded user object, or None."""
+        return self.users.get(str(user_id))
+
+    def username(self, user_id, default: str = 'unknown') -> str:
+        """Return an expanded user's username."""
+        user = self.user(user_id)
+        return user.username if user else default
+
+    def tweet(self, tweet_id):
+        """Return an expanded (referenced) tweet, or None."""
+        return self.tweets.get(str(tweet_id))
+
+class CandidateWindow:
+    """Rolling window of recent tweets that may become popular, keyed by tweet ID."""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self.posts = {}  # {tweet_id: post}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.posts)
+
+    def add(self, post: dict) -> dict:
+        """Merge a discovered post, refreshing counts and keywords if it is already tracked."""
+        tweet_id = str(post['id'])
+        with self.lock:
+            existing = self.posts.get(tweet_id)
+            if existing is None:
+                self.posts[tweet_id] = post
+                return post
+
+            for key in ('likes', 'retweets', 'replies'):
+                existing[key] = post[key]
+            for keyword in post.get('keywords', []):
+                if keyword not in existing.setdefault('keywords', []):
+                    existing['keywords'].append(keyword)
+            if existing.get('keywords'):
+                existing['keyword'] = ', '.join(existing['keywords'])
+            return existing
+
+    def update_metrics(self, tweet_id, public_metrics: dict) -> Optional[dict]:
+        """Replace a tracked post's engagement counts."""
+        with self.lock:
+            post = self.posts.get(str(tweet_id))
+            if post is not None:
+                post['likes'] = public_metrics.get('like_count', 0)
+                post['retweets'] = public_metrics.get('retweet_count', 0)
+                post['replies'] = public_metrics.get('reply_count', 0)
+            return post
+
+    def remove(self, tweet_id):
+        """Stop tracking a post."""
+        with self.lock:
+            self.posts.pop(str(tweet_id), None)
+
+    def prune(self, time_threshold: datetime.datetime) -> list:
+        """Drop posts older than time_threshold, then the oldest past max_size; return dropped IDs."""
+        with self.lock:
+            dropped = [tweet_id for tweet_id, post in self.posts.items() if post['created_at'] < time_threshold]
+            for tweet_id in dropped:
+                del self.posts[tweet_id]
+
+            if len(self.posts) > self.max_size:
+                by_age = sorted(self.posts, key=lambda tweet_id: self.posts[tweet_id]['created_at'])
+                overflow = by_age[:len(self.posts) - self.max_size]
+                for tweet_id in overflow:
+                    del self.posts[tweet_id]
+                dropped.extend(overflow)
+            return dropped
+
+    def candidates(self, source: Optional[str] = None) -> list:
+        """Return tracked posts, optionally only those discovered from one source."""
+        with self.lock:
+            return [post for post in self.posts.values() if source is None or post.get('source') == source]
+
+class OpenRouterClient:
+    """Pooled client for the OpenRouter chat completions endpoint."""
+
+    API_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+    def __init__(self, api_key: str, model: str, pool_size: int = 4,
+                 connect_timeout: float = 5, read_timeout: float = 30):
+        """Create a keep-alive session so repeated calls reuse TLS connections."""
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def complete(self, prompt: str, temperature: float = 0.7, max_tokens: int = 100) -> Optional[str]:
+        """Send a single-message chat completion and return the stripped reply text."""
+        data = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+
+        response = self.session.post(self.API_URL, json=data, timeout=self.timeout)
+
+        if response.status_code != 200:
+            logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+            return None
+
+        result = response.json()
+        return result['choices'][0]['message']['content'].strip()
+
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+
+class FactPool:
+    """Buffer of pre-generated facts per prompt category, refilled in the background."""
+
+    def __init__(self, path: str, generators: dict, capacity: int = 10, low_water: int = 3,
+                 batch_size: int = 5):
+        """Create a pool; generators maps each category to a callable taking a count and returning a list of facts."""
+        self.path = path
+        self.generators = generators
+        self.capacity = capacity
+        self.low_water = low_water
+        self.batch_size = batch_size
+        self.facts = {category: [] for category in generators}
+        self.lock = threading.Lock()
+        self.refill_needed = threading.Event()
+        self.thread = None
+        self.load()
+
+    def load(self):
+        """Load previously generated facts from disk."""
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+            for category, facts in stored.items():
+                if category in self.facts:
+                    self.facts[category] = list(facts)[:self.capacity]
+            logger.info(f"Loaded fact pool from {self.path}: {self.sizes()}")
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.error(f"Ignoring unreadable fact pool file {self.path}: {e}")
+
+    def save(self):
+        """Write the pool to disk atomically."""
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.facts, f)
+            os.replace(tmp_path, self.path)
+
+    def sizes(self) -> dict:
+        """Return the number of ready facts per category."""
+        with self.lock:
+            return {category: len(facts) for category, facts in self.facts.items()}
+
+    def pop(self, category: str) -> Optional[str]:
+        """Take a ready fact, or return None if the category is empty."""
+        with self.lock:
+            facts = self.facts.get(category)
+            fact = facts.pop(0) if facts else None
+            remaining = len(facts) if facts is not None else 0
+
+        if remaining < self.low_water:
+            self.refill_needed.set()
+        if fact is not None:
+            self.save()
+        return fact
+
+    def refill(self):
+        """Generate facts until every category is back at capacity."""
+        for category, generate in self.generators.items():
+            while self.sizes()[category] < self.capacity:
+                needed = self.capacity - self.sizes()[category]
+                facts = generate(min(needed, self.batch_size))
+                if not facts:
+                    logger.error(f"Failed to refill fact pool category '{category}'")
+                    break
+                with self.lock:
+                    self.facts[category].extend(facts[:needed])
+            self.save()
+
+    def start(self, interval_seconds: float = 300):
+        """Start the background refill thread."""
+        if self.thread:
+            return
+        self.refill_needed.set()
+        self.thread = threading.Thread(target=self._refill_loop, args=(interval_seconds,),
+                                       name='fact-pool', daemon=True)
+        self.thread.start()
+
+    def _refill_loop(self, interval_seconds: float):
+        """Refill whenever a pop drops a category below the low-water mark."""
+        while True:
+            self.refill_needed.wait(interval_seconds)
+            self.refill_needed.clear()
+            if any(size < self.low_water for size in self.sizes().values()):
+                try:
+                    self.refill()
+                except Exception as e:
+                    logger.error(f"Error refilling fact pool: {e}")
+
+class RateLimitExceeded(Exception):
+    """Raised instead of sleeping when a Twitter endpoint has no requests left in its window."""
+
+    def __init__(self, endpoint: str, reset_at: float):
+        self.endpoint = endpoint
+        self.reset_at = reset_at
+        super().__init__(f"Rate limit exhausted for {endpoint}, resets in {self.retry_after():.0f}s")
+
+    def retry_after(self) -> float:
+        """Seconds until the endpoint's window resets."""
+        return max(self.reset_at - clock.time(), 0)
+
+class RateLimitTracker:
+    """Per-endpoint token buckets kept in sync with Twitter's x-rate-limit-* headers."""
+
+    def __init__(self):
+        self.buckets = {}  # {endpoint: {'limit': int, 'remaining': int, 'reset_at': float}}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def endpoint_key(method: str, route: str) -> str:
+        """Collapse a concrete route into its endpoint, e.g. 'GET /2/users/:id/mentions'."""
+        segments = route.split('/')
+        # Skip the leading '' and API version segments
+        for i, segment in enumerate(segments[2:], start=2):
+            if segment.isdigit():
+                segments[i] = ':id'
+            elif segments[i - 1] == 'username':
+                segments[i] = ':username'
+        return f"{method} {'/'.join(segments)}"
+
+    def acquire(self, endpoint: str):
+        """Take one request token, raising RateLimitExceeded if the endpoint is exhausted."""
+        with self.lock:
+            bucket = self.buckets.get(endpoint)
+            if bucket is None:
+                return
+            if clock.time() >= bucket['reset_at']:
+                # The window has rolled over; refill until the next response tells us otherwise
+                bucket['remaining'] = bucket['limit']
+            if bucket['remaining'] <= 0:
+                raise RateLimitExceeded(endpoint, bucket['reset_at'])
+            bucket['remaining'] -= 1
+
+    def update(self, endpoint: str, headers):
+        """Record the limit, remaining count and reset time reported by a response."""
+        try:
+            limit = int(headers['x-rate-limit-limit'])
+            remaining = int(headers['x-rate-limit-remaining'])
+            reset_at = float(headers['x-rate-limit-reset'])
+        except (KeyError, ValueError):
+            return
+
+        with self.lock:
+            self.buckets[endpoint] = {'limit': limit, 'remaining': remaining, 'reset_at': reset_at}
+
+    def exhaust(self, endpoint: str, reset_at: Optional[float]):
+        """Mark an endpoint as empty until reset_at after a 429 response."""
+        if reset_at is None:
+            reset_at = clock.time() + 15 * 60
+        with self.lock:
+            bucket = self.buckets.setdefault(endpoint, {'limit': 1, 'remaining': 0, 'reset_at': reset_at})
+            bucket['remaining'] = 0
+            bucket['reset_at'] = reset_at
+
+class RateLimitedClient(tweepy.Client):
+    """tweepy.Client that fails fast per endpoint instead of sleeping the whole process."""
+
+    def __init__(self, *args, rate_limits: RateLimitTracker, **kwargs):
+        super().__init__(*args, wait_on_rate_limit=False, **kwargs)
+        self.rate_limits = rate_limits
+
+    def request(self, method, route, params=None, json=None, user_auth=False):
+        endpoint = self.rate_limits.endpoint_key(method, route)
+        self.rate_limits.acquire(endpoint)
+
+        try:
+            response = super().request(method, route, params=params, json=json, user_auth=user_auth)
+        except tweepy.TooManyRequests as e:
+            self.rate_limits.exhaust(endpoint, e.reset_time)
+            raise RateLimitExceeded(endpoint, self.rate_limits.buckets[endpoint]['reset_at']) from e
+
+        self.rate_limits.update(endpoint, response.headers)
+        return response
+
+class StateStore:
+    """SQLite-backed store for cursors, the bot's own tweet IDs and reply chains."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cursors (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS bot_tweets (
+            tweet_id TEXT PRIMARY KEY,
+            conversation_id TEXT,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_bot_tweets_conversation ON bot_tweets (conversation_id);
+        CREATE TABLE IF NOT EXISTS conversations (
+            conversation_id TEXT PRIMARY KEY,
+            original_post TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS chain_replies (
+            tweet_id TEXT PRIMARY KEY,
+            conversation_id TEXT NOT NULL,
+            in_reply_to TEXT,
+            text TEXT,
+            is_bot_reply INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_chain_replies_conversation ON chain_replies (conversation_id, created_at);
+        CREATE TABLE IF NOT EXISTS candidates (
+            tweet_id TEXT PRIMARY KEY,
+            post TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_candidates_created ON candidates (created_at);
+        CREATE TABLE IF NOT EXISTS actions (
+            tweet_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (tweet_id, action)
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            username_key TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            resolved_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_user_id ON users (user_id);
+        CREATE TABLE IF NOT EXISTS identity (
+            fingerprint TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            resolved_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, batch_size: int = 20):
+        """Open (or create) the database in WAL mode."""
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []  # Buffered (sql, params) writes, committed together by flush()
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+
+    def write(self, sql: str, params: tuple):
+        """Buffer a write, committing the batch once it is full."""
+        with self.lock:
+            self.pending.append((sql, params))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Commit all buffered writes in one transaction."""
+        with self.lock:
+            if not self.pending:
+                return
+            with self.conn:
+                for sql, params in self.pending:
+                    self.conn.execute(sql, params)
+            self.pending = []
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        """Run a read after committing buffered writes so it sees them."""
+        with self.lock:
+            self.flush()
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        """Flush and close the database."""
+        with self.lock:
+            self.flush()
+            self.conn.close()
+
+    def get_cursor(self, name: str) -> Optional[str]:
+        """Return a stored cursor value such as last_mention_id."""
+        rows = self.query("SELECT value FROM cursors WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def set_cursor(self, name: str, value):
+        """Store a cursor value."""
+        self.write("INSERT OR REPLACE INTO cursors (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def delete_cursor(self, name: str):
+        """Forget a stored cursor."""
+        self.write("DELETE FROM cursors WHERE name = ?", (name,))
+
+    def add_bot_tweet(self, tweet_id, conversation_id=None):
+        """Remember a tweet the bot posted."""
+        self.write(
+            "INSERT OR IGNORE INTO bot_tweets (tweet_id, conversation_id, created_at) VALUES (?, ?, ?)",
+            (str(tweet_id), str(conversation_id) if conversation_id else None, clock.time())
+        )
+
+    def load_bot_tweets(self, limit: int = -1, since: float = 0) -> list:
+        """Return (tweet_id, created_at) for the newest bot tweets posted after since, oldest first."""
+        rows = self.query(
+            "SELECT tweet_id, created_at FROM bot_tweets WHERE created_at >= ? ORDER BY created_at DESC LIMIT ?",
+            (since, limit)
+        )
+        return rows[::-1]
+
+    def save_conversation(self, conversation_id, original_post: dict):
+        """Store the post a tracked conversation started from."""
+        self.write(
+            "INSERT OR REPLACE INTO conversations (conversation_id, original_post, updated_at) VALUES (?, ?, ?)",
+            (str(conversation_id), json.dumps(original_post, default=str), clock.time())
+        )
+
+    def add_chain_reply(self, conversation_id, reply: dict):
+        """Append a reply to a tracked conversation."""
+        self.write(
+            "INSERT OR IGNORE INTO chain_replies "
+            "(tweet_id, conversation_id, in_reply_to, text, is_bot_reply, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (str(reply['id']), str(conversation_id), str(reply.get('in_reply_to')), reply.get('text'),
+             int(reply.get('is_bot_reply', False)), reply['timestamp'].timestamp())
+        )
+
+    def count_bot_replies(self, conversation_id) -> int:
+        """Return how many of the bot's own replies are recorded in a conversation."""
+        rows = self.query(
+            "SELECT COUNT(*) FROM chain_replies WHERE conversation_id = ? AND is_bot_reply = 1",
+            (str(conversation_id),)
+        )
+        return rows[0][0]
+
+    def save_candidate(self, post: dict):
+        """Store (or update) a popular-post candidate."""
+        stored = dict(post, created_at=post['created_at'].isoformat())
+        self.write(
+            "INSERT OR REPLACE INTO candidates (tweet_id, post, created_at) VALUES (?, ?, ?)",
+            (str(post['id']), json.dumps(stored, default=str), post['created_at'].timestamp())
+        )
+
+    def delete_candidates(self, tweet_ids: list):
+        """Forget candidates that left the window."""
+        for tweet_id in tweet_ids:
+            self.write("DELETE FROM candidates WHERE tweet_id = ?", (str(tweet_id),))
+
+    def load_candidates(self, since: float = 0) -> list:
+        """Return stored candidates created after since."""
+        posts = []
+        for (post,) in self.query("SELECT post FROM candidates WHERE created_at >= ? ORDER BY created_at", (since,)):
+            post = json.loads(post)
+            post['created_at'] = datetime.datetime.fromisoformat(post['created_at'])
+            posts.append(post)
+        return posts
+
+    def add_action(self, tweet_id, action: str):
+        """Record that an action (like, retweet, reply) was performed on a tweet."""
+        self.write(
+            "INSERT OR IGNORE INTO actions (tweet_id, action, created_at) VALUES (?, ?, ?)",
+            (str(tweet_id), action, clock.time())
+        )
+
+    def has_action(self, tweet_id, action: str) -> bool:
+        """Return True if the action was already recorded for the tweet."""
+        return bool(self.query("SELECT 1 FROM actions WHERE tweet_id = ? AND action = ?", (str(tweet_id), action)))
+
+    def load_actions(self) -> list:
+        """Return every recorded (tweet_id, action) pair."""
+        return self.query("SELECT tweet_id, action FROM actions")
+
+    def save_user(self, user_id, username: str, resolved_at: float):
+        """Store (or refresh) a username -> user ID mapping."""
+        self.write(
+            "INSERT OR REPLACE INTO users (username_key, username, user_id, resolved_at) VALUES (?, ?, ?, ?)",
+            (username.lower(), username, str(user_id), resolved_at)
+        )
+
+    def load_user(self, username: str) -> Optional[tuple]:
+        """Return (user_id, username, resolved_at) for a username, or None."""
+        rows = self.query("SELECT user_id, username, resolved_at FROM users WHERE username_key = ?",
+                          (username.lower(),))
+        return rows[0] if rows else None
+
+    def load_username(self, user_id) -> Optional[str]:
+        """Return the most recently seen username for a user ID, or None."""
+        rows = self.query("SELECT username FROM users WHERE user_id = ? ORDER BY resolved_at DESC LIMIT 1",
+                          (str(user_id),))
+        return rows[0][0] if rows else None
+
+    def save_identity(self, fingerprint: str, user_id, username: str):
+        """Store the authenticated account for the credentials with this fingerprint."""
+        self.write(
+            "INSERT OR REPLACE INTO identity (fingerprint, user_id, username, resolved_at) VALUES (?, ?, ?, ?)",
+            (fingerprint, str(user_id), username, clock.time())
+        )
+
+    def load_identity(self, fingerprint: str) -> Optional[tuple]:
+        """Return (user_id, username) stored for these credentials, or None."""
+        rows = self.query("SELECT user_id, username FROM identity WHERE fingerprint = ?", (fingerprint,))
+        return rows[0] if rows else None
+
+    # Last activity per conversation: its original post being stored or any reply in it
+    CONVERSATION_ACTIVITY = (
+        "SELECT conversation_id, MAX(active_at) AS active_at FROM ("
+        "SELECT conversation_id, updated_at AS active_at FROM conversations "
+        "UNION ALL SELECT conversation_id, created_at FROM chain_replies"
+        ") GROUP BY conversation_id"
+    )
+
+    def load_reply_chains(self, limit: int = -1, since: float = 0) -> dict:
+        """Rebuild {conversation_id: {'original_post': post, 'replies': [reply]}} from disk.
+
+        Only the limit most recently active conversations with activity after since are read.
+        """
+        rows = self.query(
+            f"SELECT conversation_id FROM ({self.CONVERSATION_ACTIVITY}) WHERE active_at >= ? "
+            "ORDER BY active_at DESC LIMIT ?",
+            (since, limit)
+        )
+        conversation_ids = [conversation_id for (conversation_id,) in rows]
+
+        chains = {}
+        # SQLite caps the number of bound parameters, so the conversations are read in chunks
+        for start in range(0, len(conversation_ids), 500):
+            chunk = conversation_ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self.query(
+                f"SELECT conversation_id, original_post, updated_at FROM conversations "
+                f"WHERE conversation_id IN ({placeholders})",
+                tuple(chunk)
+            )
+            for conversation_id, original_post, updated_at in rows:
+                chains[conversation_id] = {
+                    'original_post': json.loads(original_post) if original_post else None,
+                    'updated_at': datetime.datetime.fromtimestamp(updated_at, datetime.timezone.utc),
+                    'replies': []
+                }
+
+            rows = self.query(
+                f"SELECT conversation_id, tweet_id, in_reply_to, text, is_bot_reply, created_at "
+                f"FROM chain_replies WHERE conversation_id IN ({placeholders}) ORDER BY conversation_id, created_at",
+                tuple(chunk)
+            )
+            for conversation_id, tweet_id, in_reply_to, text, is_bot_reply, created_at in rows:
+                chains.setdefault(conversation_id, {'replies': []})['replies'].append({
+                    'id': tweet_id,
+                    'text': text,
+                    'in_reply_to': in_reply_to,
+                    'timestamp': datetime.datetime.fromtimestamp(created_at, datetime.timezone.utc),
+                    'is_bot_reply': bool(is_bot_reply)
+                })
+        return chains
+
+    def delete_expired(self, conversations_before: float, bot_tweets_before: float):
+        """Delete conversations with no activity since conversations_before and older bot tweets."""
+        expired = f"SELECT conversation_id FROM ({self.CONVERSATION_ACTIVITY}) WHERE active_at < ?"
+        with self.lock:
+            self.flush()
+            with self.conn:
+                self.conn.execute(f"DELETE FROM chain_replies WHERE conversation_id IN ({expired})",
+                                  (conversations_before,))
+                self.conn.execute(f"DELETE FROM conversations WHERE conversation_id IN ({expired})",
+                                  (conversations_before,))
+                self.conn.execute("DELETE FROM bot_tweets WHERE created_at < ?", (bot_tweets_before,))
+
+def approximate_size(obj) -> int:
+    """Estimate the deep memory footprint of nested dicts, lists, sets and scalars in bytes."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+class BoundedCache:
+    """LRU mapping bounded by entry count and by time since each entry was last touched."""
+
+    MISSING = object()
+
+    def __init__(self, max_entries: Optional[int] = None, max_age_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.entries = OrderedDict()  # {key: (last_touched, value)}, least recently used first
+        self.evicted_by_size = 0
+        self.evicted_by_age = 0
+        self.lock = threading.RLock()
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, self.MISSING) is not self.MISSING
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Return a live entry and mark it as recently used."""
+        with self.lock:
+            self.evict()
+            if key not in self.entries:
+                return default
+            _, value = self.entries[key]
+            self.entries[key] = (clock.time(), value)
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, timestamp: Optional[float] = None):
+        """Insert or refresh an entry, evicting the coldest ones past the bounds.
+
+        Explicit timestamps must not go backwards, so restore entries oldest first.
+        """
+        with self.lock:
+            touched = timestamp if timestamp is not None else clock.time()
+            self.entries[key] = (touched, value)
+            self.entries.move_to_end(key)
+            self.evict()
+
+    def add(self, key, timestamp: Optional[float] = None):
+        """Use the cache as a bounded set."""
+        self.put(key, True, timestamp)
+
+    def evict(self):
+        """Drop entries older than max_age_seconds, then the least recently used past max_entries."""
+        with self.lock:
+            if self.max_age_seconds is not None:
+                # Entries are kept in touch order, so the expired ones are all at the front
+                cutoff = clock.time() - self.max_age_seconds
+                while self.entries:
+                    touched, _ = next(iter(self.entries.values()))
+                    if touched >= cutoff:
+                        break
+                    self.entries.popitem(last=False)
+                    self.evicted_by_age += 1
+
+            if self.max_entries is not None:
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evicted_by_size += 1
+
+    def values(self) -> list:
+        """Return live values, least recently used first."""
+        with self.lock:
+            self.evict()
+            return [value for _, value in self.entries.values()]
+
+    def stats(self) -> dict:
+        """Return entry count, eviction counts and approximate memory footprint."""
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'evicted_by_size': self.evicted_by_size,
+                'evicted_by_age': self.evicted_by_age,
+                'approx_bytes': approximate_size(self.entries)
+            }
+
+class ConversationIndex:
+    """Tracked conversations keyed by conversation_id, with a reply tree and bot-reply depth counter."""
+
+    def __init__(self, max_conversations: Optional[int] = None, max_age_seconds: Optional[float] = None,
+                 count_bot_replies=None):
+        # {conversation_id: {'original_post': post, 'replies': {tweet_id: reply},
+        #                    'children': {parent_id: [tweet_id]}, 'bot_depth': int}}
+        self.conversations = BoundedCache(max_conversations, max_age_seconds)
+        # Seeds bot_depth when an evicted conversation comes back, so eviction can't reset the depth limit
+        self.count_bot_replies = count_bot_replies
+
+    @classmethod
+    def from_chains(cls, chains: dict, count_bot_replies=None, **bounds) -> 'ConversationIndex':
+        """Build an index from {conversation_id: {'original_post': post, 'replies': [reply]}}."""
+        index = cls(**bounds)
+
+        def last_activity(item):
+            _, chain = item
+            times = [reply['timestamp'] for reply in chain.get('replies', [])]
+            if chain.get('updated_at'):
+                times.append(chain['updated_at'])
+            return max(times).timestamp() if times else 0
+
+        # Insert least recently active first so the LRU order survives a restart
+        for item in sorted(chains.items(), key=last_activity):
+            conversation_id, chain = item
+            timestamp = last_activity(item)
+            index.start(conversation_id, chain.get('original_post'), timestamp=timestamp)
+            for reply in chain.get('replies', []):
+                index.add_reply(conversation_id, reply, timestamp=timestamp)
+        # Attached only now: the chains already carry every stored reply, so counting them again would double up
+        index.count_bot_replies = count_bot_replies
+        return index
+
+    def __contains__(self, conversation_id) -> bool:
+        return str(conversation_id) in self.conversations
+
+    def __len__(self) -> int:
+        return len(self.conversations)
+
+    def start(self, conversation_id, original_post: Optional[dict] = None,
+              timestamp: Optional[float] = None) -> dict:
+        """Register a conversation, keeping any original post already recorded."""
+        conversation = self.conversations.get(str(conversation_id))
+        if conversation is None:
+            conversation = {
+                'original_post': None,
+                'replies': {},
+                'children': {},
+                'bot_depth': self.count_bot_replies(conversation_id) if self.count_bot_replies else 0
+            }
+        if original_post is not None:
+            conversation['original_post'] = original_post
+        self.conversations.put(str(conversation_id), conversation, timestamp)
+        return conversation
+
+    def add_reply(self, conversation_id, reply: dict, timestamp: Optional[float] = None):
+        """Attach a reply under its parent tweet and update the bot-reply depth."""
+        conversation = self.start(conversation_id, timestamp=timestamp)
+        reply_id = str(reply['id'])
+        if reply_id in conversation['replies']:
+            return
+
+        conversation['replies'][reply_id] = reply
+        conversation['children'].setdefault(str(reply.get('in_reply_to')), []).append(reply_id)
+        if reply.get('is_bot_reply'):
+            conversation['bot_depth'] += 1
+
+    def original_post(self, conversation_id) -> Optional[dict]:
+        """Return the post a conversation started from, if known."""
+        conversation = self.conversations.get(str(conversation_id))
+        return conversation['original_post'] if conversation else None
+
+    def bot_depth(self, conversation_id) -> int:
+        """Return how many times the bot has replied in a conversation."""
+        conversation = self.conversations.get(str(conversation_id))
+        if conversation:
+            return conversation['bot_depth']
+        return self.count_bot_replies(conversation_id) if self.count_bot_replies else 0
+
+    def children(self, conversation_id, tweet_id) -> list:
+        """Return the IDs of direct replies to a tweet within a conversation."""
+        conversation = self.conversations.get(str(conversation_id))
+        return list(conversation['children'].get(str(tweet_id), [])) if conversation else []
+
+    def stats(self) -> dict:
+        """Return size, eviction and memory figures for the tracked conversations."""
+        return self.conversations.stats()
+
+class BloomFilter:
+    """Fixed-size Bloom filter for fast "definitely not seen" checks."""
+
+    def __init__(self, expected_items: int = 100000, false_positive_rate: float = 0.01):
+        self.size = max(8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # Double hashing: derive every probe position from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self._positions(key))
+
+class ActionLedger:
+    """Persistent record of (tweet_id, action) pairs already performed, fronted by a Bloom filter."""
+
+    def __init__(self, state: 'StateStore', expected_items: int = 100000):
+        self.state = state
+        self.bloom = BloomFilter(expected_items)
+        for tweet_id, action in state.load_actions():
+            self.bloom.add(self.key(tweet_id, action))
+
+    @staticmethod
+    def key(tweet_id, action: str) -> str:
+        return f"{tweet_id}:{action}"
+
+    def has(self, tweet_id, action: str) -> bool:
+        """Return True if the action was already performed on the tweet."""
+        # Most lookups are for new tweets, which the filter rules out without touching SQLite
+        if self.key(tweet_id, action) not in self.bloom:
+            return False
+        return self.state.has_action(tweet_id, action)
+
+    def record(self, tweet_id, action: str):
+        """Remember that an action was performed on a tweet."""
+        self.bloom.add(self.key(tweet_id, action))
+        self.state.add_action(tweet_id, action)
+
+# Work priorities shared by the job, LLM and action queues; lower numbers run first
+PRIORITY_MENTION = 0
+PRIORITY_THREAD_REPLY = 1
+PRIORITY_POPULAR_POSTS = 2
+PRIORITY_DAILY_POST = 3
+
+class PriorityExecutor:
+    """Worker threads that run the highest-priority task first, FIFO within a priority.
+
+    With max_workers=0 no threads are started and tasks only run when the caller calls run_next().
+    """
+
+    def __init__(self, max_workers: int = 1, thread_name_prefix: str = 'jobs'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.tasks = []  # heap of (priority, sequence, func, args, kwargs, future)
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.threads = []
+
+    def __len__(self) -> int:
+        with self.condition:
+            return len(self.tasks)
+
+    def submit(self, func, *args, priority: int = PRIORITY_DAILY_POST, **kwargs) -> Future:
+        """Queue func(*args, **kwargs) at the given priority and return a future for its result."""
+        future = Future()
+        with self.condition:
+            heapq.heappush(self.tasks, (priority, next(self.sequence), func, args, kwargs, future))
+            self.condition.notify()
+            # Start workers lazily, like ThreadPoolExecutor
+            if len(self.threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker_loop, daemon=True,
+                                          name=f"{self.thread_name_prefix}-{len(self.threads)}")
+                self.threads.append(thread)
+                thread.start()
+        return future
+
+    def run_next(self, timeout: float = None) -> bool:
+        """Run the highest-priority queued task; returns False if none arrived before timeout."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.tasks, timeout):
+                return False
+            priority, sequence, func, args, kwargs, future = heapq.heappop(self.tasks)
+
+        if not future.set_running_or_notify_cancel():
+            return True
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return True
+
+    def _worker_loop(self):
+        while True:
+            self.run_next()
+
+# Client-side budgets per write action: (max actions, window in seconds)
+DEFAULT_ACTION_QUOTAS = {
+    'like': (50, 900),
+    'retweet': (50, 900),
+    'reply': (50, 900),
+    'post': (25, 900)
+}
+
+class GenerationFailed(Exception):
+    """Raised by a queued generation that produced no text, so the write waiting on it is dropped."""
+
+class ActionSkipped(Exception):
+    """Raised by a queued action that decided not to write; it resolves with None and uses no quota."""
+
+class ActionQueue:
+    """Outbound write actions drained by a pacer thread within per-action-type quotas."""
+
+    def __init__(self, quotas: dict, min_interval_seconds: float = 2.0):
+        """quotas maps an action type to (max_actions, window_seconds); unlisted types are only paced."""
+        self.quotas = {action: (int(limit), float(window)) for action, (limit, window) in quotas.items()}
+        self.min_interval_seconds = min_interval_seconds
+        self.queues = {}  # {(action, priority): deque of (sequence, key, func, args, after, future)}
+        self.sent = {}  # {action: deque of start times still inside the quota window}
+        self.blocked_until = {}  # {action: reset time of a server-side rate limit}
+        self.pending_keys = {}  # {key: future} for actions queued but not yet finished
+        self.last_sent_at = 0.0
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def __len__(self) -> int:
+        with self.condition:
+            return sum(len(queue) for queue in self.queues.values())
+
+    def enqueue(self, action: str, func, *args, key: str = None, after: Future = None,
+                priority: int = PRIORITY_DAILY_POST) -> Future:
+        """Queue func(*args) as an action of the given type and return a future for its result.
+
+        If after is given the action waits for it and receives its result as a final argument.
+        Actions of one type and priority run in order; among those that are due, the highest
+        priority goes first. An action whose key is already queued is not added again; the
+        existing future is returned.
+        """
+        with self.condition:
+            if key is not None and key in self.pending_keys:
+                return self.pending_keys[key]
+            future = Future()
+            if key is not None:
+                self.pending_keys[key] = future
+            self.queues.setdefault((action, priority), deque()).append(
+                (next(self.sequence), key, func, args, after, future))
+            self.condition.notify()
+        if after is not None:
+            after.add_done_callback(lambda _: self.wake())
+        return future
+
+    def pending(self, key: str) -> Optional[Future]:
+        """Return the future of a queued action with this key, or None."""
+        with self.condition:
+            return self.pending_keys.get(key)
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify()
+
+    def next_due(self) -> Optional[float]:
+        """Time the next queued action may start, or None if nothing is ready to be scheduled."""
+        with self.condition:
+            due = self.next_action(clock.time())
+            return due[0] if due else None
+
+    def ready_at(self, action: str, now: float) -> float:
+        """Earliest time the next action of this type may start."""
+        ready = max(self.blocked_until.get(action, 0), self.last_sent_at + self.min_interval_seconds)
+        if action in self.quotas:
+            limit, window = self.quotas[action]
+            sent = self.sent.setdefault(action, deque())
+            while sent and sent[0] <= now - window:
+                sent.popleft()
+            if len(sent) >= limit:
+                ready = max(ready, sent[0] + window)
+        return ready
+
+    def next_action(self, now: float):
+        """Return (start_time, queue) for the action that may start soonest, by priority then age on ties."""
+        best = None
+        for (action, priority), queue in self.queues.items():
+            if not queue or (queue[0][4] is not None and not queue[0][4].done()):
+                continue
+            candidate = (max(self.ready_at(action, now), now), priority, queue[0][0], (action, priority))
+            if best is None or candidate < best:
+                best = candidate
+        return (best[0], best[3]) if best else None
+
+    def run_next(self, timeout: float = None) -> bool:
+        """Wait for the next action to come due and run it; returns False if nothing ran before timeout."""
+        with self.condition:
+            deadline = None if timeout is None else clock.time() + timeout
+            while True:
+                now = clock.time()
+                due = self.next_action(now)
+                if due and due[0] <= now:
+                    break
+                wait = due[0] - now if due else None
+                if deadline is not None:
+                    if deadline <= now:
+                        return False
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self.condition.wait(wait)
+            queue = due[1]
+            action = queue[0]
+            entry = self.queues[queue].popleft()
+
+        sequence, key, func, args, after, future = entry
+        if after is not None:
+            # A failed prerequisite (e.g. reply generation) fails the action without writing anything;
+            # the caller decides whether to queue it again
+            if after.exception() is not None:
+                logger.error(f"Queued {action} dropped, its input failed: {after.exception()}")
+                self.finish(key, future, exception=after.exception())
+                return True
+            args = args + (after.result(),)
+
+        try:
+            result = func(*args)
+        except ActionSkipped as e:
+            logger.info(f"Queued {action} skipped: {e}")
+            self.finish(key, future)
+            return True
+        except RateLimitExceeded as e:
+            # Put it back at the head of its queue and hold that action type until the window resets
+            logger.warning(f"Deferring queued {action}: {e}")
+            with self.condition:
+                self.blocked_until[action] = e.reset_at
+                self.queues[queue].appendleft(entry)
+            return True
+        except Exception as e:
+            logger.error(f"Queued {action} failed: {e}")
+            self.record_sent(action)
+            self.finish(key, future, exception=e)
+            return True
+
+        self.record_sent(action)
+        self.finish(key, future, result=result)
+        return True
+
+    def record_sent(self, action: str):
+        """Count a write that reached the API against its quota and the pacing interval."""
+        with self.condition:
+            now = clock.time()
+            self.last_sent_at = now
+            self.sent.setdefault(action, deque()).append(now)
+
+    def finish(self, key: Optional[str], future: Future, result=None, exception: Exception = None):
+        """Resolve an action's future and let its key be queued again."""
+        with self.condition:
+            self.pending_keys.pop(key, None)
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def start(self):
+        """Start the background pacer thread."""
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._drain_loop, name='action-pacer', daemon=True)
+        self.thread.start()
+
+    def _drain_loop(self):
+        while True:
+            try:
+                self.run_next()
+            except Exception as e:
+                logger.error(f"Error draining action queue: {e}")
+
+class UserDirectory:
+    """Username <-> user ID cache with a TTL, persisted in the state store and resolved in batches."""
+
+    BATCH_SIZE = 100  # Usernames per users/by lookup
+
+    def __init__(self, state: 'StateStore', client: tweepy.Client, ttl_seconds: float = 7 * 86400,
+                 max_entries: int = 10000):
+        self.state = state
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.by_username = BoundedCache(max_entries)  # {username lowercased: (user_id, username, resolved_at)}
+        self.by_id = BoundedCache(max_entries)  # {user_id: username}
+
+    def remember(self, user_id, username: str, resolved_at: Optional[float] = None):
+        """Record a user seen in a response; unchanged entries are only rewritten once half their TTL is up."""
+        resolved_at = resolved_at if resolved_at is not None else clock.time()
+        user_id = str(user_id)
+        cached = self.by_username.get(username.lower())
+        if cached and cached[0] == user_id and resolved_at - cached[2] < self.ttl_seconds / 2:
+            return
+        self.by_username.put(username.lower(), (user_id, username, resolved_at))
+        self.by_id.put(user_id, username)
+        self.state.save_user(user_id, username, resolved_at)
+
+    def remember_includes(self, includes: ResponseIncludes):
+        """Record every expanded user in a response."""
+        for user in includes.users.values():
+            self.remember(user.id, user.username)
+
+    def lookup(self, username: str) -> Optional[str]:
+        """Return a cached, unexpired user ID for a username without calling the API."""
+        entry = self.by_username.get(username.lower())
+        if entry is None:
+            entry = self.state.load_user(username)
+            if entry:
+                self.by_username.put(username.lower(), entry)
+        if entry and clock.time() - entry[2] < self.ttl_seconds:
+            return entry[0]
+        return None
+
+    def username(self, user_id) -> Optional[str]:
+        """Return the last known username for a user ID, or None."""
+        username = self.by_id.get(str(user_id))
+        if username is None:
+            username = self.state.load_username(user_id)
+            if username:
+                self.by_id.put(str(user_id), username)
+        return username
+
+    def resolve(self, usernames: list) -> dict:
+        """Return {username: user_id}, looking up missing or expired usernames 100 per request.
+
+        Usernames that don't exist are left out.
+        """
+        resolved = {}
+        missing = {}  # {username lowercased: username as first requested}
+        for username in usernames:
+            user_id = self.lookup(username)
+            if user_id:
+                resolved[username] = user_id
+            else:
+                missing.setdefault(username.lower(), username)
+
+        found = {}
+        pending = list(missing.values())
+        for start in range(0, len(pending), self.BATCH_SIZE):
+            response = self.client.get_users(usernames=pending[start:start + self.BATCH_SIZE],
+                                             user_fields=['username'])
+            for user in response.data or []:
+                self.remember(user.id, user.username)
+                found[user.username.lower()] = str(user.id)
+
+        for username in usernames:
+            if username in resolved:
+                continue
+            if username.lower() in found:
+                resolved[username] = found[username.lower()]
+            else:
+                logger.error(f"User @{username} not found")
+        return resolved
+
+    def stats(self) -> dict:
+        return self.by_username.stats()
+
+# Tweets of a conversation given to the model as thread context (also the search API's minimum page size)
+CONVERSATION_CONTEXT_TWEETS = 10
+
 class TwitterBot:
-    def __init__(self, config_file: str = 'config.json'):
-        """Initialize the Twitter bot with configuration."""
+    def __init__(self, config_file: str = 'config.json', twitter_api: tweepy.Client = None,
+                 openrouter: OpenRouterClient = None, threaded: bool = True):
+        """Initialize the Twitter bot with configuration.
+
+        twitter_api and openrouter replace the real clients, as the simulation harness does with its
+        fakes. With threaded=False no background threads are started and the caller runs queued work
+        through run_next() on mention_executor, job_executor, llm_executor and action_queue.
+        """
         self.config = self.load_config(config_file)
-        self.twitter_api = self.setup_twitter_api()
-        self.username = self.get_username()
-        self.last_mention_id = None
-        self.reply_chains = {}  # Store conversation chains: {tweet_id: {'original_post': post_data, 'replies': [reply_data]}}
-        self.bot_replies = set()  # Track tweet IDs of our own replies
+        self.threaded = threaded
+        self.openrouter = openrouter or OpenRouterClient(
+            api_key=self.config['openrouter_api_key'],
+            model=self.config.get('openrouter_model', 'anthropic/claude-3-haiku'),
+            pool_size=self.config.get('openrouter_pool_size', 4),
+            connect_timeout=self.config.get('openrouter_connect_timeout', 5),
+            read_timeout=self.config.get('openrouter_timeout', 30)
+        )
+        self.llm_executor = PriorityExecutor(
+            max_workers=self.config.get('llm_max_concurrency', 4) if threaded else 0,
+            thread_name_prefix='llm'
+        )
+        self.fact_pool = None
+        if self.config.get('fact_pool_enabled', False):
+            self.fact_pool = FactPool(
+                path=self.config.get('fact_pool_file', 'fact_pool.json'),
+                generators={
+                    'statement': self.generate_random_statements,
+                    'reply': self.generate_random_fact_replies
+                },
+                capacity=self.config.get('fact_pool_size', 10),
+                low_water=self.config.get('fact_pool_low_water', 3),
+                batch_size=self.config.get('fact_batch_size', 5)
+            )
+            if threaded:
+                self.fact_pool.start()
+        self.rate_limits = RateLimitTracker()
+        self.twitter_api = twitter_api or self.setup_twitter_api()
+        self.state = StateStore(
+            self.config.get('state_db_path', 'bot_state.db'),
+            batch_size=self.config.get('state_write_batch_size', 20)
+        )
+        self.user_id, self.username = self.load_identity()
+        self.users = UserDirectory(
+            self.state,
+            self.twitter_api,
+            ttl_seconds=self.config.get('user_cache_ttl_hours', 168) * 3600,
+            max_entries=self.config.get('max_cached_users', 10000)
+        )
+        self.last_mention_id = self.state.get_cursor('last_mention_id')
+        self.cursor_lock = threading.Lock()  # Queued replies advance the mention cursor from the pacer thread
+        self.prune_state()
+        max_conversations = self.config.get('max_tracked_conversations', 1000)
+        conversation_max_age = self.config.get('tracked_conversation_max_age_hours', 72) * 3600
+        self.conversations = ConversationIndex.from_chains(
+            self.state.load_reply_chains(limit=max_conversations, since=clock.time() - conversation_max_age),
+            count_bot_replies=self.state.count_bot_replies,
+            max_conversations=max_conversations,
+            max_age_seconds=conversation_max_age
+        )
+        self.bot_replies = self.load_bot_replies()  # Track tweet IDs of our own replies
+        self.candidate_window = self.load_candidate_window()
+        self.action_ledger = ActionLedger(self.state, self.config.get('action_ledger_expected_items', 100000))
+        self.conversation_contexts = BoundedCache(  # {conversation_id: {'lines': [...], 'newest_id': str}}
+            self.config.get('max_cached_conversation_contexts', 500),
+            self.config.get('conversation_context_max_age_hours', 24) * 3600
+        )
+        self.candidates_refreshed_at = {}  # {source or None for all: time of last bulk metric refresh}
+        self.action_queue = ActionQueue(
+            {**DEFAULT_ACTION_QUOTAS, **self.config.get('action_quotas', {})},
+            min_interval_seconds=self.config.get('action_min_interval_seconds', 2)
+        )
+        self.job_executor = PriorityExecutor(self.config.get('job_workers', 1) if threaded else 0,
+                                             thread_name_prefix='jobs')
+        # Mention checks get a worker of their own so popular-post discovery never delays them
+        self.mention_executor = PriorityExecutor(1 if threaded else 0, thread_name_prefix='mentions')
+        if threaded:
+            self.action_queue.start()
+        self.queued_jobs = {}  # {job name: future of its latest submitted run}
         
     def load_config(self, config_file: str) -> dict:
         """Load configuration from JSON file."""
@@ -63,154 +1410,239 @@ class TwitterBot:
             logger.error(f"Invalid JSON in configuration file {config_file}")
             raise
     
+    def load_bot_replies(self) -> BoundedCache:
+        """Load the bot's recent tweet IDs into a size- and age-bounded set."""
+        max_entries = self.config.get('max_tracked_bot_replies', 10000)
+        max_age_seconds = self.config.get('tracked_bot_reply_max_age_hours', 168) * 3600
+
+        bot_replies = BoundedCache(max_entries, max_age_seconds)
+        for tweet_id, created_at in self.state.load_bot_tweets(limit=max_entries, since=clock.time() - max_age_seconds):
+            bot_replies.add(tweet_id, timestamp=created_at)
+        return bot_replies
+
+    def load_candidate_window(self) -> CandidateWindow:
+        """Restore the popular-post candidate window so discovery can resume from its cursors."""
+        window = CandidateWindow(self.config.get('candidate_window_size', 1000))
+        hours_ago = self.config.get('popular_posts_max_age_hours', 24)
+        for post in self.state.load_candidates(since=clock.time() - hours_ago * 3600):
+            window.add(post)
+        return window
+
+    def memory_stats(self) -> dict:
+        """Return size, eviction and memory figures for the in-memory tracking structures."""
+        return {
+            'bot_replies': self.bot_replies.stats(),
+            'conversations': self.conversations.stats(),
+            'users': self.users.stats(),
+            'conversation_contexts': self.conversation_contexts.stats()
+        }
+
+    def prune_state(self):
+        """Delete stored conversations and bot tweets that have aged out of the in-memory trackers."""
+        now = clock.time()
+        self.state.delete_expired(
+            conversations_before=now - self.config.get('tracked_conversation_max_age_hours', 72) * 3600,
+            bot_tweets_before=now - self.config.get('tracked_bot_reply_max_age_hours', 168) * 3600
+        )
+
+    def log_memory_stats(self):
+        """Log the footprint of the in-memory tracking structures."""
+        for name, stats in self.memory_stats().items():
+            logger.info(
+                f"Memory {name}: {stats['entries']} entries, ~{stats['approx_bytes'] // 1024} KiB, "
+                f"evicted {stats['evicted_by_size']} by size and {stats['evicted_by_age']} by age"
+            )
+
     def setup_twitter_api(self) -> tweepy.Client:
         """Setup Twitter API client."""
         try:
-            client = tweepy.Client(
+            client = RateLimitedClient(
                 bearer_token=self.config['twitter_bearer_token'],
                 consumer_key=self.config['twitter_consumer_key'],
                 consumer_secret=self.config['twitter_consumer_secret'],
                 access_token=self.config['twitter_access_token'],
                 access_token_secret=self.config['twitter_access_token_secret'],
-                wait_on_rate_limit=True
+                rate_limits=self.rate_limits
             )
 
-            # Test the connection
-            client.get_me()
-            logger.info("Twitter API connection established successfully")
+            # The identity lookup in load_identity doubles as the connection test when it is not cached
+            logger.info("Twitter API client configured")
             return client
 
         except Exception as e:
             logger.error(f"Failed to setup Twitter API: {e}")
             raise
 
-    def get_username(self) -> str:
-        """Get the authenticated user's username."""
+    def identity_fingerprint(self) -> str:
+        """Short hash of the access token, so a stored identity is dropped when the account changes."""
+        return hashlib.sha256(self.config['twitter_access_token'].encode()).hexdigest()[:16]
+
+    def load_identity(self) -> tuple:
+        """Return the authenticated account's (user_id, username), calling users/me only when not stored."""
+        stored = self.state.load_identity(self.identity_fingerprint())
+        if stored:
+            user_id, username = stored
+            logger.info(f"Authenticated as: @{username} (cached)")
+            return user_id, username
+
         try:
-            user = self.twitter_api.get_me()
-            username = user.data.username
-            logger.info(f"Authenticated as: @{username}")
-            return username
+            user = self.twitter_api.get_me().data
         except Exception as e:
-            logger.error(f"Failed to get username: {e}")
-            return "unknown"
-    
+            logger.error(f"Failed to get authenticated user: {e}")
+            raise
+
+        self.state.save_identity(self.identity_fingerprint(), user.id, user.username)
+        self.state.flush()
+        logger.info(f"Authenticated as: @{user.username}")
+        return str(user.id), user.username
+
+    # Random prompts for variety - focused on random facts
+    STATEMENT_PROMPTS = [
+        "Share a bizarre but true fact about animals in under 280 characters.",
+        "Tell me a weird historical fact that sounds made up but isn't in under 280 characters.",
+        "Share a strange fact about space or the universe in under 280 characters.",
+        "Give me an odd fact about the human body in under 280 characters.",
+        "Share a random fact about food or cooking that most people don't know in under 280 characters.",
+        "Tell me a weird fact about technology or inventions in under 280 characters.",
+        "Share a bizarre fact about nature or weather in under 280 characters.",
+        "Give me a random fact about a country or culture in under 280 characters.",
+        "Share an odd fact about language or words in under 280 characters.",
+        "Tell me a strange fact about the ocean or marine life in under 280 characters."
+    ]
+
+    # Prompts specifically for replies - more conversational
+    REPLY_PROMPTS = [
+        "Share a fun random fact in under 250 characters (leaving room for @username).",
+        "Tell me something weird but true in under 250 characters.",
+        "Give me a bizarre fact that will surprise someone in under 250 characters.",
+        "Share an odd fact about animals, space, history, or science in under 250 characters.",
+        "Tell me something random and interesting in under 250 characters."
+    ]
+
+    # Scheduled jobs by name; anything unlisted runs at the lowest priority
+    JOB_PRIORITIES = {
+        'check_and_reply_to_mentions': PRIORITY_MENTION,
+        'check_and_interact_with_popular_posts': PRIORITY_POPULAR_POSTS,
+        'rerank_candidates': PRIORITY_POPULAR_POSTS,
+        'create_and_post_tweet': PRIORITY_DAILY_POST
+    }
+
     def generate_random_statement(self) -> Optional[str]:
         """Generate a random statement using OpenRouter API."""
-        try:
-            # Random prompts for variety - focused on random facts
-            prompts = [
-                "Share a bizarre but true fact about animals in under 280 characters.",
-                "Tell me a weird historical fact that sounds made up but isn't in under 280 characters.",
-                "Share a strange fact about space or the universe in under 280 characters.",
-                "Give me an odd fact about the human body in under 280 characters.",
-                "Share a random fact about food or cooking that most people don't know in under 280 characters.",
-                "Tell me a weird fact about technology or inventions in under 280 characters.",
-                "Share a bizarre fact about nature or weather in under 280 characters.",
-                "Give me a random fact about a country or culture in under 280 characters.",
-                "Share an odd fact about language or words in under 280 characters.",
-                "Tell me a strange fact about the ocean or marine life in under 280 characters."
-            ]
-            
-            selected_prompt = random.choice(prompts)
-            
-            headers = {
-                "Authorization": f"Bearer {self.config['openrouter_api_key']}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": self.config.get('openrouter_model', 'anthropic/claude-3-haiku'),
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": selected_prompt
-                    }
-                ],
-                "max_tokens": 100,
-                "temperature": 0.8
-            }
-            
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                statement = result['choices'][0]['message']['content'].strip()
-                
-                # Ensure it's under Twitter's character limit
-                if len(statement) > 280:
-                    statement = statement[:277] + "..."
-                
-                logger.info(f"Generated statement: {statement}")
+        if self.fact_pool:
+            statement = self.fact_pool.pop('statement')
+            if statement:
+                logger.info(f"Using pre-generated statement: {statement}")
                 return statement
-            else:
-                logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+
+        try:
+            selected_prompt = random.choice(self.STATEMENT_PROMPTS)
+
+            statement = self.openrouter.complete(selected_prompt, temperature=0.8, max_tokens=100)
+            if not statement:
                 return None
-                
+
+            # Ensure it's under Twitter's character limit
+            if len(statement) > 280:
+                statement = statement[:277] + "..."
+
+            logger.info(f"Generated statement: {statement}")
+            return statement
+
         except Exception as e:
             logger.error(f"Error generating statement: {e}")
             return None
 
+    def generate_required(self, generate, *args) -> str:
+        """Run a generator for a queued write, raising GenerationFailed if it produced no text."""
+        text = generate(*args)
+        if not text:
+            raise GenerationFailed(f"{generate.__name__} produced no text")
+        return text
+
+    def generate_random_statements(self, count: int) -> list:
+        """Generate several random statements in a single completion call."""
+        return self.generate_fact_batch(self.STATEMENT_PROMPTS, count, max_length=280, temperature=0.8)
+
     def generate_random_fact_reply(self) -> Optional[str]:
         """Generate a random fact for replying to mentions."""
+        if self.fact_pool:
+            fact = self.fact_pool.pop('reply')
+            if fact:
+                logger.info(f"Using pre-generated reply fact: {fact}")
+                return fact
+
         try:
-            # Prompts specifically for replies - more conversational
-            reply_prompts = [
-                "Share a fun random fact in under 250 characters (leaving room for @username).",
-                "Tell me something weird but true in under 250 characters.",
-                "Give me a bizarre fact that will surprise someone in under 250 characters.",
-                "Share an odd fact about animals, space, history, or science in under 250 characters.",
-                "Tell me something random and interesting in under 250 characters."
-            ]
+            selected_prompt = random.choice(self.REPLY_PROMPTS)
 
-            selected_prompt = random.choice(reply_prompts)
+            fact = self.openrouter.complete(selected_prompt, temperature=0.9, max_tokens=100)
+            if not fact:
+                return None
 
-            headers = {
-                "Authorization": f"Bearer {self.config['openrouter_api_key']}",
-                "Content-Type": "application/json"
-            }
+            # Ensure it's under character limit (leaving room for @username)
+            if len(fact) > 250:
+                fact = fact[:247] + "..."
 
-            data = {
-                "model": self.config.get('openrouter_model', 'anthropic/claude-3-haiku'),
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": selected_prompt
-                    }
-                ],
-                "max_tokens": 100,
-                "temperature": 0.9
-            }
+            logger.info(f"Generated reply fact: {fact}")
+            return fact
 
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30
-            )
+        except Exception as e:
+            logger.error(f"Error generating reply fact: {e}")
+            return None
 
-            if response.status_code == 200:
-                result = response.json()
-                fact = result['choices'][0]['message']['content'].strip()
+    def generate_random_fact_replies(self, count: int) -> list:
+        """Generate several reply facts in a single completion call."""
+        return self.generate_fact_batch(self.REPLY_PROMPTS, count, max_length=250, temperature=0.9)
 
-                # Ensure it's under character limit (leaving room for @username)
-                if len(fact) > 250:
-                    fact = fact[:247] + "..."
+    def generate_fact_batch(self, prompts: list, count: int, max_length: int, temperature: float) -> list:
+        """Ask for several facts as a JSON list and keep only the ones that pass validation."""
+        try:
+            selected_prompts = [random.choice(prompts) for _ in range(count)]
+            numbered = "\n".join(f"{i + 1}. {prompt}" for i, prompt in enumerate(selected_prompts))
 
-                logger.info(f"Generated reply fact: {fact}")
-                return fact
-            else:
-                logger.error(f"OpenRouter API error for reply: {response.status_code} - {response.text}")
-                return None
+            prompt = f"""Answer each of the following {count} requests with one distinct fact.
+            Respond with ONLY a JSON array of {count} strings, one fact per string, and nothing else.
+
+            {numbered}"""
+
+            content = self.openrouter.complete(prompt, temperature=temperature, max_tokens=100 * count)
+            if not content:
+                return []
+
+            facts = self.parse_fact_batch(content, max_length)
+            logger.info(f"Generated {len(facts)} of {count} facts in one batch")
+            return facts
 
         except Exception as e:
-            logger.error(f"Error generating reply fact: {e}")
-            return None
+            logger.error(f"Error generating fact batch: {e}")
+            return []
+
+    @staticmethod
+    def parse_fact_batch(content: str, max_length: int) -> list:
+        """Extract the JSON list from a completion, dropping items that are not usable facts."""
+        start = content.find('[')
+        end = content.rfind(']')
+        if start == -1 or end < start:
+            logger.error(f"Fact batch response is not a JSON list: {content[:100]}")
+            return []
+
+        try:
+            items = json.loads(content[start:end + 1])
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON in fact batch response: {e}")
+            return []
+
+        facts = []
+        for item in items:
+            if not isinstance(item, str) or not item.strip():
+                logger.warning(f"Dropping invalid fact from batch: {item!r}")
+                continue
+            fact = item.strip()
+            if len(fact) > max_length:
+                logger.warning(f"Dropping fact over {max_length} characters from batch")
+                continue
+            facts.append(fact)
+        return facts
 
     def post_to_twitter(self, text: str) -> bool:
         """Post text to Twitter."""
@@ -221,6 +1653,8 @@ class TwitterBot:
             logger.info(f"Tweet ID: {response.data['id']}")
             return True
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error posting to Twitter: {e}")
             return False
@@ -238,155 +1672,520 @@ class TwitterBot:
             logger.info(f"Reply Tweet ID: {reply_id}")
 
             # Track this as our reply
-            self.bot_replies.add(reply_id)
+            self.bot_replies.add(str(reply_id))
+            self.state.add_bot_tweet(reply_id, original_post_id)
 
             # If this is a reply to a popular post, track the conversation chain
             if original_post_id and self.config.get('track_reply_chains', False):
-                if original_post_id not in self.reply_chains:
-                    self.reply_chains[original_post_id] = {'replies': []}
-
-                self.reply_chains[original_post_id]['replies'].append({
+                reply = {
                     'id': reply_id,
                     'text': text,
                     'in_reply_to': in_reply_to_tweet_id,
-                    'timestamp': datetime.datetime.now(datetime.timezone.utc),
+                    'timestamp': clock.now(),
                     'is_bot_reply': True
-                })
+                }
+                self.conversations.add_reply(original_post_id, reply)
+                self.state.add_chain_reply(original_post_id, reply)
 
             return True
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error replying to tweet: {e}")
             return False
 
     def check_and_reply_to_mentions(self):
-        """Check for new mentions and reply to them."""
+        """Fetch new mentions once and route each to the thread-aware or random-fact reply path."""
         try:
-            logger.info("Checking for new mentions...")
+            reply_to_mentions = self.config.get('reply_to_mentions', True)
+            reply_to_replies = self.config.get('reply_to_replies', False)
+            if not reply_to_mentions and not reply_to_replies:
+                return
 
-            # Get my user ID
-            my_user_id = self.twitter_api.get_me().data.id
+            logger.info("Checking for new mentions...")
 
-            # Get mentions using the correct API method
-            mentions = self.twitter_api.get_users_mentions(
-                id=my_user_id,
-                since_id=self.last_mention_id,
-                max_results=10,
-                tweet_fields=['author_id', 'created_at', 'conversation_id'],
-                expansions=['author_id'],
-                user_fields=['username']
-            )
+            my_user_id = self.user_id
 
-            if not mentions.data:
+            first_run = self.last_mention_id is None
+            mentions = list(self.iter_mentions(my_user_id, since_id=self.last_mention_id))
+            if not mentions:
                 logger.info("No new mentions found")
                 return
 
-            logger.info(f"Found {len(mentions.data)} new mentions")
+            logger.info(f"Found {len(mentions)} new mentions")
+
+            # With no cursor yet, answer only the newest few and move the cursor past the rest
+            backlog = 0
+            if first_run:
+                backlog = max(0, len(mentions) - self.config.get('first_run_mention_limit', 10))
+                if backlog:
+                    logger.info(f"First run: skipping {backlog} older mentions")
+
+            # Route every mention, oldest first, and start all reply generation concurrently
+            routed = []
+            thread_replies = Counter()  # {conversation_id: thread replies routed in this check}
+            for index, (mention, includes) in enumerate(mentions):
+                # Skip our own tweets, and the backlog from before the first run
+                if str(mention.author_id) == str(my_user_id) or index < backlog:
+                    routed.append((mention, includes, None, None))
+                    continue
 
-            # Create user mapping for usernames
-            users_map = {}
-            if mentions.includes and 'users' in mentions.includes:
-                for user in mentions.includes['users']:
-                    users_map[user.id] = user.username
+                # Never answer the same mention twice, even across restarts
+                if self.action_ledger.has(mention.id, 'reply'):
+                    routed.append((mention, includes, None, None))
+                    continue
 
-            for mention in mentions.data:
-                # Skip our own tweets
-                if str(mention.author_id) == str(my_user_id):
+                # A reply from an earlier check may still be waiting in the action queue
+                queued = self.action_queue.pending(ActionLedger.key(mention.id, 'reply'))
+                if queued:
+                    routed.append((mention, includes, None, queued))
                     continue
 
-                logger.info(f"Processing mention from user {mention.author_id}: {mention.text}")
+                replied_to = self.get_replied_bot_tweet(mention) if reply_to_replies else None
+                if replied_to:
+                    logger.info(f"Found reply to our tweet {replied_to}: {mention.text}")
+                    future = self.start_thread_reply(mention, includes,
+                                                     pending=thread_replies[mention.conversation_id])
+                    if future:
+                        thread_replies[mention.conversation_id] += 1
+                elif reply_to_mentions:
+                    logger.info(f"Processing mention from user {mention.author_id}: {mention.text}")
+                    future = self.llm_executor.submit(self.generate_required, self.generate_random_fact_reply,
+                                                      priority=PRIORITY_MENTION)
+                else:
+                    future = None
 
-                # Generate a random fact reply
-                fact = self.generate_random_fact_reply()
-                if fact:
+                if future:
                     # Get the username of the person who mentioned us
-                    username = users_map.get(mention.author_id, 'unknown')
-
-                    # Create reply with username
-                    reply_text = f"@{username} {fact}"
-
-                    # Reply to the mention
-                    success = self.reply_to_tweet(reply_text, mention.id)
-                    if success:
-                        logger.info(f"Successfully replied to @{username}")
+                    username = (includes.username(mention.author_id, default=None)
+                                or self.users.username(mention.author_id) or 'unknown')
+                    if replied_to:
+                        post_reply, priority = self.post_thread_reply, PRIORITY_THREAD_REPLY
                     else:
-                        logger.error(f"Failed to reply to @{username}")
-                else:
-                    logger.error("Failed to generate fact for reply")
+                        post_reply, priority = self.post_fact_reply, PRIORITY_MENTION
+                    future = self.action_queue.enqueue('reply', post_reply, mention, username, after=future,
+                                                       key=ActionLedger.key(mention.id, 'reply'), priority=priority)
 
-                # Update last mention ID
-                self.last_mention_id = mention.id
+                routed.append((mention, includes, replied_to, future))
 
-                # Add a small delay between replies to avoid rate limiting
-                time.sleep(2)
+            # Advance the cursor past each mention only once it and every older mention are handled,
+            # so a restart with replies still queued picks them up again
+            handled = [(mention.id, future) for mention, includes, replied_to, future in routed]
+            self.advance_mention_cursor(handled)
+            for mention_id, future in handled:
+                if future:
+                    future.add_done_callback(functools.partial(self.advance_mention_cursor, handled))
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error checking mentions: {e}")
 
+    def advance_mention_cursor(self, handled: list, done: Future = None):
+        """Move the mention cursor past the oldest mentions whose queued replies have all finished.
+
+        handled lists (mention_id, reply future or None) oldest first; done is the reply that just finished.
+        A reply that failed on a rate limit or produced no text holds the cursor so a later check routes
+        its mention again.
+        """
+        mention_id = None
+        for candidate_id, future in handled:
+            if future and (not future.done()
+                           or isinstance(future.exception(), (RateLimitExceeded, GenerationFailed))):
+                break
+            mention_id = candidate_id
+        if mention_id is None:
+            return
+
+        with self.cursor_lock:
+            if self.last_mention_id and int(mention_id) <= int(self.last_mention_id):
+                return
+            self.last_mention_id = mention_id
+            self.state.set_cursor('last_mention_id', mention_id)
+        if done:
+            self.state.flush()
+
+    def iter_mention_pages(self, user_id, since_id=None):
+        """Yield every page of mentions newer than since_id, following next_token."""
+        pagination_token = None
+        # The API takes 5-100 results per page; a fresh start only needs enough for the first-run limit
+        max_results = 100 if since_id else min(100, max(5, self.config.get('first_run_mention_limit', 10)))
+        while True:
+            response = self.twitter_api.get_users_mentions(
+                id=user_id,
+                since_id=since_id,
+                max_results=max_results,
+                pagination_token=pagination_token,
+                tweet_fields=['author_id', 'created_at', 'conversation_id', 'in_reply_to_user_id', 'referenced_tweets'],
+                expansions=['referenced_tweets.id', 'author_id'],
+                user_fields=['username']
+            )
+            if response.data:
+                yield response
+
+            pagination_token = (response.meta or {}).get('next_token')
+            # Without a cursor only the newest page is read, so a fresh start doesn't answer old mentions
+            if not pagination_token or since_id is None:
+                return
+
+    def iter_mentions(self, user_id, since_id=None):
+        """Yield (mention, includes) for every mention newer than since_id, oldest first."""
+        # Pages arrive newest first, so they are collected before being replayed in order
+        pages = list(self.iter_mention_pages(user_id, since_id=since_id))
+
+        for page in reversed(pages):
+            includes = ResponseIncludes.from_response(page)
+            self.users.remember_includes(includes)
+            for mention in reversed(page.data):
+                yield mention, includes
+
+    def get_replied_bot_tweet(self, mention) -> Optional[str]:
+        """Return the ID of the bot tweet this mention replies to, if any."""
+        for ref_tweet in mention.referenced_tweets or []:
+            if ref_tweet.type == 'replied_to' and str(ref_tweet.id) in self.bot_replies:
+                return str(ref_tweet.id)
+        return None
+
+    def start_thread_reply(self, mention, includes: Optional[ResponseIncludes] = None, pending: int = 0):
+        """Start generating a thread-aware reply, or return None if the thread is too deep.
+
+        pending counts replies in the same conversation already routed but not yet posted.
+        """
+        # Find the original post this conversation started from
+        conversation_id = mention.conversation_id
+        original_post = self.conversations.original_post(conversation_id)
+
+        # Check conversation depth to avoid infinite loops
+        if self.reply_chain_too_deep(conversation_id, pending):
+            return None
+
+        # Hand over what the mentions response already told us so the context needs no tweet lookup
+        reply_tweet = {
+            'id': mention.id,
+            'text': mention.text,
+            'conversation_id': mention.conversation_id,
+            'referenced_tweets': mention.referenced_tweets
+        }
+        return self.llm_executor.submit(
+            self.generate_required,
+            self.generate_contextual_reply_with_thread,
+            reply_tweet,
+            original_post,
+            includes,
+            priority=PRIORITY_THREAD_REPLY
+        )
+
+    def reply_chain_too_deep(self, conversation_id, pending: int = 0) -> bool:
+        """Return whether the bot has reached max_reply_chain_depth in a conversation."""
+        max_depth = self.config.get('max_reply_chain_depth', 5)
+        if self.conversations.bot_depth(conversation_id) + pending >= max_depth:
+            logger.info(f"Max conversation depth ({max_depth}) reached for conversation {conversation_id}")
+            return True
+        return False
+
+    def post_fact_reply(self, mention, username: str, fact: str):
+        """Reply to a mention with a random fact."""
+        # Create reply with username
+        reply_text = f"@{username} {fact}"
+
+        # Reply to the mention
+        success = self.reply_to_tweet(reply_text, mention.id)
+        if success:
+            self.action_ledger.record(mention.id, 'reply')
+            logger.info(f"Successfully replied to @{username}")
+        else:
+            logger.error(f"Failed to reply to @{username}")
+
+    def post_thread_reply(self, mention, username: str, reply_text: str):
+        """Reply to someone who answered one of the bot's tweets."""
+        # Replies queued by an earlier check may have reached the limit since this one was routed
+        if self.reply_chain_too_deep(mention.conversation_id):
+            raise ActionSkipped(f"conversation {mention.conversation_id} is at the reply chain depth limit")
+
+        # Record the incoming reply so the bot's answer hangs under it in the thread tree
+        if self.config.get('track_reply_chains', False):
+            incoming = {
+                'id': mention.id,
+                'text': mention.text,
+                'in_reply_to': self.get_replied_bot_tweet(mention),
+                'timestamp': mention.created_at or clock.now(),
+                'is_bot_reply': False
+            }
+            self.conversations.add_reply(mention.conversation_id, incoming)
+            self.state.add_chain_reply(mention.conversation_id, incoming)
+
+        # Create reply with username
+        full_reply = f"@{username} {reply_text}"
+
+        # Reply to the mention
+        success = self.reply_to_tweet(full_reply, mention.id, original_post_id=mention.conversation_id)
+        if success:
+            self.action_ledger.record(mention.id, 'reply')
+            logger.info(f"Successfully replied to @{username} in conversation thread")
+        else:
+            logger.error(f"Failed to reply to @{username} in conversation thread")
+
+    def score_post(self, post: dict) -> float:
+        """Score a candidate post with the configured ranking and record the score on it."""
+        scorer = POST_SCORERS[self.config.get('popular_posts_ranking', 'velocity')]
+        weights = self.config.get('popular_posts_score_weights', {})
+        post['score'] = scorer(post, weights, clock.now())
+        return post['score']
+
+    def post_from_tweet(self, tweet, includes: ResponseIncludes, source: str, keywords: Optional[list] = None) -> dict:
+        """Convert an API tweet into the post dict used by ranking and interaction."""
+        post = {
+            'id': tweet.id,
+            'text': tweet.text,
+            'likes': tweet.public_metrics.get('like_count', 0),
+            'retweets': tweet.public_metrics.get('retweet_count', 0),
+            'replies': tweet.public_metrics.get('reply_count', 0),
+            'created_at': tweet.created_at,
+            'author_id': tweet.author_id,
+            'author_username': includes.username(tweet.author_id),
+            'source': source
+        }
+        if keywords:
+            post['keyword'] = ', '.join(keywords)
+            post['keywords'] = list(keywords)
+        return post
+
+    def add_candidate(self, post: dict, time_threshold: datetime.datetime):
+        """Merge a newly discovered tweet into the candidate window if it is recent enough."""
+        if post['created_at'] < time_threshold:
+            return
+        self.state.save_candidate(self.candidate_window.add(post))
+
+    def refresh_metrics(self, ids: list) -> dict:
+        """Re-hydrate public_metrics for many tweets, 100 per get_tweets call.
+
+        Returns {tweet_id: public_metrics}; deleted or protected tweets are absent.
+        """
+        metrics = {}
+        for start in range(0, len(ids), 100):
+            response = self.twitter_api.get_tweets(ids=ids[start:start + 100], tweet_fields=['public_metrics'])
+            for tweet in response.data or []:
+                metrics[str(tweet.id)] = tweet.public_metrics
+        return metrics
+
+    def is_plausible_candidate(self, post: dict) -> bool:
+        """Return whether a post is young enough, or liked fast enough, to still reach popular_posts_min_likes."""
+        now = clock.now()
+        if post['created_at'] >= now - datetime.timedelta(hours=CANDIDATE_GRACE_HOURS):
+            return True
+        min_likes = self.config.get('popular_posts_min_likes', 1000)
+        max_age_hours = self.config.get('popular_posts_max_age_hours', 24)
+        fraction = self.config.get('candidate_min_projected_likes_fraction', 0.5)
+        return projected_likes(post, max_age_hours, now) >= min_likes * fraction
+
+    def refresh_candidates(self, sources: Optional[list] = None):
+        """Bring the candidate window's engagement counts up to date, optionally only for some sources.
+
+        Candidates that can no longer plausibly become popular are dropped instead of looked up again.
+        """
+        if sources is None:
+            posts = self.candidate_window.candidates()
+        else:
+            posts = [post for source in sources for post in self.candidate_window.candidates(source)]
+
+        ids = []
+        implausible = []
+        for post in posts:
+            (ids if self.is_plausible_candidate(post) else implausible).append(str(post['id']))
+        for tweet_id in implausible:
+            self.candidate_window.remove(tweet_id)
+        self.state.delete_candidates(implausible)
+        if not ids:
+            return
+
+        metrics = self.refresh_metrics(ids)
+        for tweet_id in ids:
+            if tweet_id not in metrics:
+                self.candidate_window.remove(tweet_id)
+                continue
+            post = self.candidate_window.update_metrics(tweet_id, metrics[tweet_id])
+            if post is not None:
+                self.state.save_candidate(post)
+        self.state.delete_candidates([tweet_id for tweet_id in ids if tweet_id not in metrics])
+
+        refreshed_at = clock.time()
+        for source in sources if sources is not None else [None]:
+            self.candidates_refreshed_at[source] = refreshed_at
+        logger.info(f"Refreshed engagement for {len(metrics)} candidate posts, dropped {len(implausible)} slow ones")
+
+    def refresh_candidates_if_stale(self, sources: list):
+        """Refresh the sources' candidates in one pass, skipping those the periodic refresh job just did."""
+        interval_minutes = self.config.get('candidate_refresh_interval_minutes', 0)
+        stale = []
+        for source in sources:
+            refreshed_at = max(self.candidates_refreshed_at.get(source, 0), self.candidates_refreshed_at.get(None, 0))
+            if not interval_minutes or clock.time() - refreshed_at >= interval_minutes * 60:
+                stale.append(source)
+        if stale:
+            self.refresh_candidates(stale)
+
+    def rerank_candidates(self):
+        """Refresh the candidates' engagement without searching and act on posts new to the top ranks."""
+        try:
+            hours_ago = self.config.get('popular_posts_max_age_hours', 24)
+            time_threshold = clock.now() - datetime.timedelta(hours=hours_ago)
+            self.state.delete_candidates(self.candidate_window.prune(time_threshold))
+
+            if self.config.get('search_all_users', False):
+                sources = ['search']
+            else:
+                sources = [f"@{username.lower()}" for username in self.target_usernames()]
+            self.refresh_candidates(sources)
+
+            # Posts already acted on wait for the next full run; newly risen ones are handled now
+            top_posts = self.rank_candidates(sources, self.config.get('popular_posts_per_run', 5), time_threshold)
+            risen = [post for post in top_posts if 'interactions_queued_at' not in post]
+            logger.info(f"Re-ranked candidates: {len(risen)} of the top {len(top_posts)} are new")
+            if risen:
+                self.queue_popular_interactions(risen)
+
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error re-ranking candidate posts: {e}")
+
+    def rank_candidates(self, sources: list, max_results: int, time_threshold: datetime.datetime) -> list:
+        """Prune the window, then return the top-ranked candidates across sources that are popular enough."""
+        self.state.delete_candidates(self.candidate_window.prune(time_threshold))
+
+        min_likes = self.config.get('popular_posts_min_likes', 1000)
+        interaction_types = self.config.get('popular_posts_interaction_types', ['like'])
+        top_posts = TopKPosts(max_results)
+        for post in (post for source in sources for post in self.candidate_window.candidates(source)):
+            if post['likes'] < min_likes:
+                continue
+            # Leave room in the top k for posts that still have work to do
+            if all(self.action_ledger.has(post['id'], interaction) for interaction in interaction_types):
+                continue
+            top_posts.push(self.score_post(post), post)
+        return top_posts.results()
+
+    def target_usernames(self) -> list:
+        """Accounts to watch: target_twitter_usernames plus the single target_twitter_username, deduplicated."""
+        usernames = list(self.config.get('target_twitter_usernames', []))
+        if self.config.get('target_twitter_username'):
+            usernames.append(self.config['target_twitter_username'])
+
+        seen = set()
+        return [username for username in usernames
+                if not (username.lower() in seen or seen.add(username.lower()))]
+
     def get_popular_posts(self, username: str, max_results: int = 10) -> list:
         """Get popular posts from a specific Twitter account."""
-        try:
-            logger.info(f"Fetching popular posts from @{username}")
+        return self.get_popular_posts_from_targets([username], max_results)
 
-            # Get user ID from username
-            user = self.twitter_api.get_user(username=username)
-            if not user.data:
-                logger.error(f"User @{username} not found")
+    def get_popular_posts_from_targets(self, usernames: list, max_results: int = 10) -> list:
+        """Fetch several accounts' timelines concurrently and rank their posts together."""
+        try:
+            # Resolve every account in one batched lookup, reusing cached IDs
+            user_ids = self.users.resolve(usernames)
+            targets = [(username, user_ids[username]) for username in usernames if username in user_ids]
+            if not targets:
                 return []
 
-            user_id = user.data.id
-
             # Calculate time threshold for recent posts
-            import datetime
             hours_ago = self.config.get('popular_posts_max_age_hours', 24)
-            time_threshold = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours_ago)
+            time_threshold = clock.now() - datetime.timedelta(hours=hours_ago)
 
-            # Get recent tweets from the user
-            tweets = self.twitter_api.get_users_tweets(
-                id=user_id,
-                max_results=max_results * 2,  # Get more to filter by popularity
-                tweet_fields=['created_at', 'public_metrics', 'author_id'],
-                exclude=['retweets', 'replies']  # Only original tweets
-            )
+            rate_limited = []
 
-            if not tweets.data:
-                logger.info(f"No tweets found for @{username}")
-                return []
+            def fetch(target):
+                try:
+                    self.fetch_timeline(*target, max_results=max_results, time_threshold=time_threshold)
+                except RateLimitExceeded as e:
+                    rate_limited.append(e)
+
+            concurrency = min(self.config.get('target_fetch_concurrency', 4) if self.threaded else 1, len(targets))
+            if concurrency > 1:
+                logger.info(f"Fetching timelines of {len(targets)} accounts, {concurrency} at a time")
+                with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='timeline') as pool:
+                    list(pool.map(fetch, targets))
+            else:
+                for target in targets:
+                    fetch(target)
 
-            # Filter and sort by popularity
-            min_likes = self.config.get('popular_posts_min_likes', 1000)
-            popular_posts = []
+            # Accounts skipped for rate limiting catch up from their cursors on the next run
+            if rate_limited:
+                if len(rate_limited) == len(targets):
+                    raise rate_limited[0]
+                logger.warning(f"Skipped {len(rate_limited)} of {len(targets)} timelines: {rate_limited[0]}")
 
-            for tweet in tweets.data:
-                # Check if tweet is recent enough
-                if tweet.created_at < time_threshold:
-                    continue
+            # Bring engagement counts of everything in the window up to date, then rank all accounts together
+            sources = [f"@{username.lower()}" for username, _ in targets]
+            self.refresh_candidates_if_stale(sources)
+            popular_posts = self.rank_candidates(sources, max_results, time_threshold)
 
-                # Check if tweet has enough likes
-                likes = tweet.public_metrics.get('like_count', 0)
-                if likes >= min_likes:
-                    popular_posts.append({
-                        'id': tweet.id,
-                        'text': tweet.text,
-                        'likes': likes,
-                        'retweets': tweet.public_metrics.get('retweet_count', 0),
-                        'replies': tweet.public_metrics.get('reply_count', 0),
-                        'created_at': tweet.created_at
-                    })
-
-            # Sort by likes (most popular first)
-            popular_posts.sort(key=lambda x: x['likes'], reverse=True)
-
-            # Limit to max_results
-            popular_posts = popular_posts[:max_results]
-
-            logger.info(f"Found {len(popular_posts)} popular posts from @{username}")
+            logger.info(f"Found {len(popular_posts)} popular posts from {', '.join('@' + name for name, _ in targets)}")
             return popular_posts
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
-            logger.error(f"Error fetching popular posts from @{username}: {e}")
+            logger.error(f"Error fetching popular posts from {', '.join('@' + name for name in usernames)}: {e}")
             return []
 
+    def fetch_timeline(self, username: str, user_id, max_results: int, time_threshold: datetime.datetime):
+        """Add an account's tweets posted since the previous run to the candidate window."""
+        try:
+            logger.info(f"Fetching popular posts from @{username}")
+
+            # Only fetch tweets posted since the last run; older ones are already in the window
+            source = f"@{username.lower()}"
+            cursor_name = f"timeline_since_id:{username.lower()}"
+            since_id = self.state.get_cursor(cursor_name)
+
+            # With a cursor, page back to it so a busy account loses nothing between runs;
+            # a first run only reads the newest page
+            max_pages = self.config.get('timeline_max_pages', 3) if since_id else 1
+            pagination_token = None
+            newest_id = None
+            found = 0
+
+            for _ in range(max_pages):
+                tweets = self.twitter_api.get_users_tweets(
+                    id=user_id,
+                    since_id=since_id,
+                    pagination_token=pagination_token,
+                    max_results=100 if since_id else max_results * 2,
+                    tweet_fields=['created_at', 'public_metrics', 'author_id'],
+                    expansions=['author_id'],
+                    user_fields=['username'],
+                    exclude=['retweets', 'replies']  # Only original tweets
+                )
+                meta = tweets.meta or {}
+                newest_id = newest_id or meta.get('newest_id')
+
+                if tweets.data:
+                    includes = ResponseIncludes.from_response(tweets)
+                    self.users.remember_includes(includes)
+                    for tweet in tweets.data:
+                        self.add_candidate(self.post_from_tweet(tweet, includes, source), time_threshold)
+                        found += 1
+
+                pagination_token = meta.get('next_token')
+                if not pagination_token:
+                    break
+
+            if since_id and pagination_token:
+                logger.warning(f"Read {max_pages} pages of new tweets from @{username}; skipping older ones")
+
+            if found == 0:
+                logger.info(f"No new tweets found for @{username}")
+
+            if newest_id:
+                self.state.set_cursor(cursor_name, newest_id)
+
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching popular posts from @{username}: {e}")
+
     def get_popular_posts_from_all_users(self, max_results: int = 10) -> list:
         """Get popular posts from all users using search."""
         try:
@@ -396,148 +2195,204 @@ class TwitterBot:
             keywords = self.config.get('search_keywords', ['trending', 'viral', 'popular'])
 
             # Calculate time threshold for recent posts
-            import datetime
             hours_ago = self.config.get('popular_posts_max_age_hours', 24)
-            time_threshold = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours_ago)
-
-            all_popular_posts = []
+            time_threshold = clock.now() - datetime.timedelta(hours=hours_ago)
 
-            # Search for each keyword
-            for keyword in keywords:
+            # Search with as few OR-combined queries as the query length limit allows
+            max_query_length = self.config.get('search_query_max_length', 512)
+            for search_query, query_keywords in plan_search_queries(keywords, max_query_length):
                 try:
-                    logger.info(f"Searching for posts with keyword: {keyword}")
-
-                    # Search for recent tweets with the keyword
-                    search_query = f"{keyword} -is:retweet -is:reply lang:en"
-
-                    tweets = self.twitter_api.search_recent_tweets(
-                        query=search_query,
-                        max_results=50,  # Get more to filter by popularity
-                        tweet_fields=['created_at', 'public_metrics', 'author_id', 'lang'],
-                        user_fields=['username', 'verified']
-                    )
-
-                    if not tweets.data:
-                        logger.info(f"No tweets found for keyword: {keyword}")
-                        continue
-
-                    # Filter and collect popular posts
-                    min_likes = self.config.get('popular_posts_min_likes', 1000)
-
-                    for tweet in tweets.data:
-                        # Check if tweet is recent enough
-                        if tweet.created_at < time_threshold:
-                            continue
-
-                        # Check if tweet has enough likes
-                        likes = tweet.public_metrics.get('like_count', 0)
-                        if likes >= min_likes:
-                            # Get author info if available
-                            author_username = 'unknown'
-                            if tweets.includes and 'users' in tweets.includes:
-                                for user in tweets.includes['users']:
-                                    if user.id == tweet.author_id:
-                                        author_username = user.username
-                                        break
-
-                            all_popular_posts.append({
-                                'id': tweet.id,
-                                'text': tweet.text,
-                                'likes': likes,
-                                'retweets': tweet.public_metrics.get('retweet_count', 0),
-                                'replies': tweet.public_metrics.get('reply_count', 0),
-                                'created_at': tweet.created_at,
-                                'author_id': tweet.author_id,
-                                'author_username': author_username,
-                                'keyword': keyword
-                            })
-
-                    # Add delay between keyword searches to avoid rate limiting
-                    time.sleep(2)
-
+                    self.search_new_candidates(search_query, query_keywords, time_threshold)
+                except RateLimitExceeded:
+                    raise
                 except Exception as e:
-                    logger.error(f"Error searching for keyword '{keyword}': {e}")
+                    logger.error(f"Error searching for keywords '{', '.join(query_keywords)}': {e}")
                     continue
 
-            # Remove duplicates (same tweet ID)
-            seen_ids = set()
-            unique_posts = []
-            for post in all_popular_posts:
-                if post['id'] not in seen_ids:
-                    seen_ids.add(post['id'])
-                    unique_posts.append(post)
-
-            # Sort by likes (most popular first)
-            unique_posts.sort(key=lambda x: x['likes'], reverse=True)
-
-            # Limit to max_results
-            popular_posts = unique_posts[:max_results]
+            # Bring engagement counts of everything in the window up to date before ranking
+            self.refresh_candidates_if_stale(['search'])
+            popular_posts = self.rank_candidates(['search'], max_results, time_threshold)
 
             logger.info(f"Found {len(popular_posts)} popular posts from all users")
             return popular_posts
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error fetching popular posts from all users: {e}")
             return []
 
+    def search_new_candidates(self, search_query: str, query_keywords: list, time_threshold: datetime.datetime):
+        """Search for tweets newer than the keywords' cursors and add them to the candidate window."""
+        logger.info(f"Searching for posts with keywords: {', '.join(query_keywords)}")
+
+        since_id = self.search_since_id(query_keywords)
+        try:
+            self.search_pages(search_query, query_keywords, since_id, time_threshold)
+        except tweepy.BadRequest as e:
+            if since_id is None:
+                raise
+            # Most likely the cursor fell out of the search window; start over from the newest tweets
+            logger.warning(f"Search cursor for {', '.join(query_keywords)} rejected ({e}), resetting it")
+            for keyword in query_keywords:
+                self.state.delete_cursor(f"search_since_id:{keyword}")
+                self.state.delete_cursor(f"search_since_at:{keyword}")
+            self.search_pages(search_query, query_keywords, None, time_threshold)
+
+    def search_since_id(self, query_keywords: list) -> Optional[str]:
+        """Return the since_id a combined query can resume from, or None if any keyword's cursor is missing or too old."""
+        # A combined query can only resume from the oldest cursor among its keywords
+        cursors = []
+        for keyword in query_keywords:
+            since_id = self.state.get_cursor(f"search_since_id:{keyword}")
+            since_at = self.state.get_cursor(f"search_since_at:{keyword}")
+            if not since_id or not since_at or clock.time() - float(since_at) > SEARCH_CURSOR_MAX_AGE_SECONDS:
+                return None
+            cursors.append(since_id)
+        return min(cursors, key=int) if cursors else None
+
+    def search_pages(self, search_query: str, query_keywords: list, since_id: Optional[str],
+                     time_threshold: datetime.datetime):
+        """Page through search results after since_id and move the keywords' cursors to the newest tweet."""
+        max_pages = self.config.get('search_max_pages', 3)
+        pagination_token = None
+        newest_id = None
+        newest_at = None
+        found = 0
+
+        for _ in range(max_pages):
+            tweets = self.twitter_api.search_recent_tweets(
+                query=search_query,
+                since_id=since_id,
+                next_token=pagination_token,
+                max_results=100,
+                tweet_fields=['created_at', 'public_metrics', 'author_id', 'lang'],
+                expansions=['author_id'],
+                user_fields=['username', 'verified']
+            )
+            meta = tweets.meta or {}
+            newest_id = newest_id or meta.get('newest_id')
+
+            if tweets.data:
+                includes = ResponseIncludes.from_response(tweets)
+                self.users.remember_includes(includes)
+                for tweet in tweets.data:
+                    if tweet.created_at and (newest_at is None or tweet.created_at.timestamp() > newest_at):
+                        newest_at = tweet.created_at.timestamp()
+                    # Attribute the tweet back to the keyword(s) it matched
+                    matched_keywords = match_keywords(tweet.text, query_keywords) or query_keywords
+                    self.add_candidate(
+                        self.post_from_tweet(tweet, includes, 'search', keywords=matched_keywords),
+                        time_threshold
+                    )
+                    found += 1
+
+            pagination_token = meta.get('next_token')
+            if not pagination_token:
+                break
+
+        if found == 0:
+            logger.info(f"No new tweets found for keywords: {', '.join(query_keywords)}")
+
+        if newest_id:
+            # Keep the newest tweet's time alongside its ID so the cursor can be dropped before search rejects it
+            for keyword in query_keywords:
+                self.state.set_cursor(f"search_since_id:{keyword}", newest_id)
+                self.state.set_cursor(f"search_since_at:{keyword}", newest_at or clock.time())
+
     def interact_with_post(self, post: dict, interaction_types: list) -> bool:
-        """Interact with a post (like, retweet, or reply)."""
+        """Queue interactions with a post (like, retweet, or reply) for the action pacer."""
         try:
             tweet_id = post['id']
-            success_count = 0
+            queued_count = 0
+
+            # Skip anything already done on an earlier run, or still queued, before spending quota or LLM calls
+            pending = [interaction for interaction in interaction_types
+                       if not self.action_ledger.has(tweet_id, interaction)
+                       and not self.action_queue.pending(ActionLedger.key(tweet_id, interaction))]
+            if len(pending) < len(interaction_types):
+                skipped = [interaction for interaction in interaction_types if interaction not in pending]
+                logger.info(f"Already performed or queued {', '.join(skipped)} on tweet {tweet_id}")
+
+            for interaction in pending:
+                key = ActionLedger.key(tweet_id, interaction)
+                if interaction == 'like':
+                    self.action_queue.enqueue('like', self.like_post, tweet_id,
+                                              key=key, priority=PRIORITY_POPULAR_POSTS)
+                elif interaction == 'retweet':
+                    self.action_queue.enqueue('retweet', self.retweet_post, tweet_id,
+                                              key=key, priority=PRIORITY_POPULAR_POSTS)
+                elif interaction == 'reply':
+                    # Generate the reply in the background; the pacer posts it once it is ready
+                    reply_text = self.llm_executor.submit(self.generate_required, self.generate_contextual_reply,
+                                                          post, priority=PRIORITY_POPULAR_POSTS)
+                    self.action_queue.enqueue('reply', self.post_popular_reply, post,
+                                              key=key, after=reply_text, priority=PRIORITY_POPULAR_POSTS)
+                else:
+                    logger.warning(f"Unknown interaction type: {interaction}")
+                    continue
+                queued_count += 1
 
-            for interaction in interaction_types:
-                try:
-                    if interaction == 'like':
-                        self.twitter_api.like(tweet_id)
-                        logger.info(f"Liked tweet {tweet_id}")
-                        success_count += 1
-
-                    elif interaction == 'retweet':
-                        self.twitter_api.retweet(tweet_id)
-                        logger.info(f"Retweeted tweet {tweet_id}")
-                        success_count += 1
-
-                    elif interaction == 'reply':
-                        # Generate a contextual reply
-                        reply_text = self.generate_contextual_reply(post)
-                        if reply_text:
-                            # Store original post data for conversation tracking
-                            if self.config.get('track_reply_chains', False):
-                                if tweet_id not in self.reply_chains:
-                                    self.reply_chains[tweet_id] = {
-                                        'original_post': post,
-                                        'replies': []
-                                    }
-
-                            self.reply_to_tweet(reply_text, tweet_id, original_post_id=tweet_id)
-                            logger.info(f"Replied to tweet {tweet_id}: {reply_text}")
-                            success_count += 1
-                        else:
-                            logger.error(f"Failed to generate reply for tweet {tweet_id}")
-
-                    # Add delay between interactions to avoid rate limiting
-                    time.sleep(2)
+            if queued_count:
+                logger.info(f"Queued {queued_count} interactions with tweet {tweet_id}")
+            return queued_count > 0 or not pending
 
-                except Exception as e:
-                    logger.error(f"Error performing {interaction} on tweet {tweet_id}: {e}")
+        except Exception as e:
+            logger.error(f"Error interacting with post {post.get('id', 'unknown')}: {e}")
+            return False
 
-            return success_count > 0
+    def like_post(self, tweet_id: str) -> bool:
+        """Like a tweet and record it in the action ledger."""
+        try:
+            self.twitter_api.like(tweet_id)
+            logger.info(f"Liked tweet {tweet_id}")
+            self.action_ledger.record(tweet_id, 'like')
+            self.state.flush()
+            return True
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
-            logger.error(f"Error interacting with post {post.get('id', 'unknown')}: {e}")
+            logger.error(f"Error performing like on tweet {tweet_id}: {e}")
+            return False
+
+    def retweet_post(self, tweet_id: str) -> bool:
+        """Retweet a tweet and record it in the action ledger."""
+        try:
+            self.twitter_api.retweet(tweet_id)
+            logger.info(f"Retweeted tweet {tweet_id}")
+            self.action_ledger.record(tweet_id, 'retweet')
+            self.state.flush()
+            return True
+
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error performing retweet on tweet {tweet_id}: {e}")
+            return False
+
+    def post_popular_reply(self, post: dict, reply_text: str) -> bool:
+        """Post a generated reply to a popular post and record it in the action ledger."""
+        tweet_id = post['id']
+        # Store original post data for conversation tracking
+        if self.config.get('track_reply_chains', False):
+            if tweet_id not in self.conversations:
+                self.conversations.start(tweet_id, post)
+                self.state.save_conversation(tweet_id, post)
+
+        if not self.reply_to_tweet(reply_text, tweet_id, original_post_id=tweet_id):
             return False
 
+        logger.info(f"Replied to tweet {tweet_id}: {reply_text}")
+        self.action_ledger.record(tweet_id, 'reply')
+        self.state.flush()
+        return True
+
     def generate_contextual_reply(self, post: dict) -> Optional[str]:
         """Generate a contextual reply to a popular post."""
         try:
             post_text = post.get('text', '')
 
-            headers = {
-                "Authorization": f"Bearer {self.config['openrouter_api_key']}",
-                "Content-Type": "application/json"
-            }
-
             prompt = f"""Generate a brief, engaging reply to this tweet in under 250 characters.
             Be conversational, relevant, and add value to the discussion. Don't just agree - provide insight, ask a thoughtful question, or share a related interesting fact.
 
@@ -545,112 +2400,124 @@ class TwitterBot:
 
             Reply:"""
 
-            data = {
-                "model": self.config.get('openrouter_model', 'anthropic/claude-3-haiku'),
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": 100,
-                "temperature": 0.7
-            }
-
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                reply = result['choices'][0]['message']['content'].strip()
+            reply = self.openrouter.complete(prompt, temperature=0.7, max_tokens=100)
+            if not reply:
+                return None
 
-                # Ensure it's under character limit
-                if len(reply) > 250:
-                    reply = reply[:247] + "..."
+            # Ensure it's under character limit
+            if len(reply) > 250:
+                reply = reply[:247] + "..."
 
-                logger.info(f"Generated contextual reply: {reply}")
-                return reply
-            else:
-                logger.error(f"OpenRouter API error for contextual reply: {response.status_code} - {response.text}")
-                return None
+            logger.info(f"Generated contextual reply: {reply}")
+            return reply
 
         except Exception as e:
             logger.error(f"Error generating contextual reply: {e}")
             return None
 
-    def get_conversation_context(self, tweet_id: str) -> str:
-        """Get the full conversation context for a tweet."""
-        try:
-            # Get the conversation thread
-            conversation = self.twitter_api.get_tweets(
-                ids=[tweet_id],
-                tweet_fields=['conversation_id', 'in_reply_to_user_id', 'referenced_tweets'],
-                expansions=['referenced_tweets.id', 'author_id'],
-                user_fields=['username']
-            )
-
-            if not conversation.data:
-                return ""
-
-            tweet = conversation.data[0]
-            conversation_id = tweet.conversation_id
-
-            # Get all tweets in the conversation
-            conversation_tweets = self.twitter_api.search_recent_tweets(
-                query=f"conversation_id:{conversation_id}",
-                max_results=100,
-                tweet_fields=['created_at', 'author_id', 'in_reply_to_user_id', 'referenced_tweets'],
-                expansions=['author_id'],
-                user_fields=['username']
-            )
-
-            if not conversation_tweets.data:
-                return ""
-
-            # Build conversation context
-            context_parts = []
-            users_map = {}
-
-            # Create user mapping
-            if conversation_tweets.includes and 'users' in conversation_tweets.includes:
-                for user in conversation_tweets.includes['users']:
-                    users_map[user.id] = user.username
-
-            # Sort tweets by creation time
-            sorted_tweets = sorted(conversation_tweets.data, key=lambda x: x.created_at)
-
-            for tweet in sorted_tweets:
-                username = users_map.get(tweet.author_id, 'unknown')
-                context_parts.append(f"@{username}: {tweet.text}")
-
-            return "\n".join(context_parts[-10:])  # Last 10 tweets for context
+    def get_conversation_context(self, tweet_id: str, conversation_id=None, referenced_tweets: Optional[list] = None,
+                                 includes: Optional[ResponseIncludes] = None) -> str:
+        """Get the conversation context for a tweet.
 
+        Pass the conversation_id, referenced_tweets and includes that came with the tweet to skip looking it up.
+        """
+        try:
+            if conversation_id is None:
+                # Get the conversation thread
+                conversation = self.twitter_api.get_tweets(
+                    ids=[tweet_id],
+                    tweet_fields=['conversation_id', 'in_reply_to_user_id', 'referenced_tweets', 'author_id'],
+                    expansions=['referenced_tweets.id', 'author_id'],
+                    user_fields=['username']
+                )
+
+                if not conversation.data:
+                    return ""
+
+                tweet = conversation.data[0]
+                conversation_id = tweet.conversation_id
+                referenced_tweets = tweet.referenced_tweets
+                includes = ResponseIncludes.from_response(conversation)
+
+            try:
+                context = self.get_thread_context(conversation_id)
+            except RateLimitExceeded as e:
+                # Reply with what the tweet itself carries rather than lose the reply to the search window
+                logger.warning(f"Replying without thread search: {e}")
+                context = ""
+            if context or not includes:
+                return context
+
+            # Recent search only covers the last week; fall back to the tweets this one replies to or quotes
+            lines = []
+            for referenced_tweet in referenced_tweets or []:
+                tweet = includes.tweet(referenced_tweet.id)
+                if tweet:
+                    username = includes.username(tweet.author_id, default=None) or self.users.username(tweet.author_id)
+                    lines.append(f"@{username or 'unknown'}: {tweet.text}")
+            return "\n".join(lines)
+
+        except RateLimitExceeded as e:
+            logger.warning(f"Replying without conversation context: {e}")
+            return ""
         except Exception as e:
             logger.error(f"Error getting conversation context: {e}")
             return ""
 
-    def generate_contextual_reply_with_thread(self, reply_tweet: dict, original_post: dict = None) -> Optional[str]:
-        """Generate a contextual reply considering the full conversation thread."""
+    def get_thread_context(self, conversation_id) -> str:
+        """Return the latest tweets of a conversation, fetching only those newer than the cached ones."""
+        cached = self.conversation_contexts.get(str(conversation_id))
+        since_id = cached['newest_id'] if cached else None
+
+        # Search returns newest first, so one page holds the most recent tweets we keep
+        conversation_tweets = self.twitter_api.search_recent_tweets(
+            query=f"conversation_id:{conversation_id}",
+            since_id=since_id,
+            max_results=CONVERSATION_CONTEXT_TWEETS,
+            tweet_fields=['created_at', 'author_id', 'in_reply_to_user_id', 'referenced_tweets'],
+            expansions=['author_id'],
+            user_fields=['username']
+        )
+
+        lines = list(cached['lines']) if cached else []
+        if conversation_tweets.data:
+            includes = ResponseIncludes.from_response(conversation_tweets)
+            self.users.remember_includes(includes)
+
+            # Tweet IDs increase with time, so sorting by ID keeps the thread in order
+            for tweet in sorted(conversation_tweets.data, key=lambda tweet: tweet.id):
+                username = includes.username(tweet.author_id, default=None) or self.users.username(tweet.author_id)
+                lines.append(f"@{username or 'unknown'}: {tweet.text}")
+            lines = lines[-CONVERSATION_CONTEXT_TWEETS:]
+
+            newest_id = max(tweet.id for tweet in conversation_tweets.data)
+            self.conversation_contexts.put(str(conversation_id), {'lines': lines, 'newest_id': str(newest_id)})
+
+        return "\n".join(lines)
+
+    def generate_contextual_reply_with_thread(self, reply_tweet: dict, original_post: dict = None,
+                                              includes: Optional[ResponseIncludes] = None) -> Optional[str]:
+        """Generate a contextual reply considering the full conversation thread.
+
+        reply_tweet may carry the conversation_id and referenced_tweets it was fetched with, and includes
+        the expansions from the same response; the thread lookup is skipped when they are present.
+        """
         try:
             reply_text = reply_tweet.get('text', '')
 
             # Get conversation context
-            conversation_context = self.get_conversation_context(reply_tweet['id'])
+            conversation_context = self.get_conversation_context(
+                reply_tweet['id'],
+                conversation_id=reply_tweet.get('conversation_id'),
+                referenced_tweets=reply_tweet.get('referenced_tweets'),
+                includes=includes
+            )
 
             # Include original post context if available
             original_context = ""
             if original_post:
                 original_context = f"Original post: {original_post.get('text', '')}\n\n"
 
-            headers = {
-                "Authorization": f"Bearer {self.config['openrouter_api_key']}",
-                "Content-Type": "application/json"
-            }
-
             prompt = f"""You are replying to a conversation thread. Generate a brief, engaging reply in under 250 characters.
             Be conversational, relevant, and add value to the discussion. Consider the full conversation context.
 
@@ -661,136 +2528,21 @@ class TwitterBot:
 
             Your reply:"""
 
-            data = {
-                "model": self.config.get('openrouter_model', 'anthropic/claude-3-haiku'),
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": 100,
-                "temperature": 0.7
-            }
-
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                reply = result['choices'][0]['message']['content'].strip()
+            reply = self.openrouter.complete(prompt, temperature=0.7, max_tokens=100)
+            if not reply:
+                return None
 
-                # Ensure it's under character limit
-                if len(reply) > 250:
-                    reply = reply[:247] + "..."
+            # Ensure it's under character limit
+            if len(reply) > 250:
+                reply = reply[:247] + "..."
 
-                logger.info(f"Generated thread-aware reply: {reply}")
-                return reply
-            else:
-                logger.error(f"OpenRouter API error for thread reply: {response.status_code} - {response.text}")
-                return None
+            logger.info(f"Generated thread-aware reply: {reply}")
+            return reply
 
         except Exception as e:
             logger.error(f"Error generating thread-aware reply: {e}")
             return None
 
-    def check_for_replies_to_bot(self):
-        """Check for replies to the bot's tweets and respond with context."""
-        try:
-            if not self.config.get('reply_to_replies', False):
-                return
-
-            logger.info("Checking for replies to bot's tweets...")
-
-            # Get my user ID
-            my_user_id = self.twitter_api.get_me().data.id
-
-            # Get mentions that might be replies to our tweets
-            mentions = self.twitter_api.get_users_mentions(
-                id=my_user_id,
-                since_id=self.last_mention_id,
-                max_results=100,
-                tweet_fields=['author_id', 'created_at', 'conversation_id', 'in_reply_to_user_id', 'referenced_tweets'],
-                expansions=['referenced_tweets.id', 'author_id'],
-                user_fields=['username']
-            )
-
-            if not mentions.data:
-                logger.info("No new mentions found")
-                return
-
-            my_user_id_str = str(my_user_id)
-            max_depth = self.config.get('max_reply_chain_depth', 5)
-
-            for mention in mentions.data:
-                # Skip our own tweets
-                if str(mention.author_id) == my_user_id_str:
-                    continue
-
-                # Check if this is a reply to one of our replies
-                if mention.referenced_tweets:
-                    for ref_tweet in mention.referenced_tweets:
-                        if ref_tweet.type == 'replied_to' and ref_tweet.id in self.bot_replies:
-                            logger.info(f"Found reply to our tweet {ref_tweet.id}: {mention.text}")
-
-                            # Find the original post this conversation started from
-                            original_post = None
-                            conversation_id = mention.conversation_id
-
-                            for post_id, chain_data in self.reply_chains.items():
-                                if post_id == conversation_id:
-                                    original_post = chain_data.get('original_post')
-                                    break
-
-                            # Check conversation depth to avoid infinite loops
-                            conversation_depth = len([r for r in self.reply_chains.get(conversation_id, {}).get('replies', []) if r.get('is_bot_reply')])
-
-                            if conversation_depth >= max_depth:
-                                logger.info(f"Max conversation depth ({max_depth}) reached for conversation {conversation_id}")
-                                continue
-
-                            # Generate contextual reply
-                            reply_text = self.generate_contextual_reply_with_thread(
-                                {'id': mention.id, 'text': mention.text},
-                                original_post
-                            )
-
-                            if reply_text:
-                                # Get the username of the person who replied
-                                username = 'unknown'
-                                if mentions.includes and 'users' in mentions.includes:
-                                    for user in mentions.includes['users']:
-                                        if user.id == mention.author_id:
-                                            username = user.username
-                                            break
-
-                                # Create reply with username
-                                full_reply = f"@{username} {reply_text}"
-
-                                # Reply to the mention
-                                success = self.reply_to_tweet(full_reply, mention.id, original_post_id=conversation_id)
-                                if success:
-                                    logger.info(f"Successfully replied to @{username} in conversation thread")
-                                else:
-                                    logger.error(f"Failed to reply to @{username} in conversation thread")
-                            else:
-                                logger.error("Failed to generate contextual thread reply")
-
-                            break
-
-                # Update last mention ID
-                self.last_mention_id = mention.id
-
-                # Add delay between replies
-                time.sleep(3)
-
-        except Exception as e:
-            logger.error(f"Error checking for replies to bot: {e}")
-
     def check_and_interact_with_popular_posts(self):
         """Check for popular posts and interact with them."""
         try:
@@ -799,88 +2551,98 @@ class TwitterBot:
 
             search_all_users = self.config.get('search_all_users', False)
 
+            max_results = self.config.get('popular_posts_per_run', 5)
+
             if search_all_users:
                 # Search for popular posts from all users
                 logger.info("Checking popular posts from all users")
-                popular_posts = self.get_popular_posts_from_all_users(max_results=5)
+                popular_posts = self.get_popular_posts_from_all_users(max_results=max_results)
             else:
-                # Search for popular posts from specific user
-                target_username = self.config.get('target_twitter_username')
-                if not target_username:
+                # Rank posts from every target account together
+                target_usernames = self.target_usernames()
+                if not target_usernames:
                     logger.warning("No target username specified for popular posts interaction")
                     return
 
-                logger.info(f"Checking popular posts from @{target_username}")
-                popular_posts = self.get_popular_posts(target_username, max_results=5)
+                logger.info(f"Checking popular posts from {len(target_usernames)} target accounts")
+                popular_posts = self.get_popular_posts_from_targets(target_usernames, max_results=max_results)
 
             if not popular_posts:
                 logger.info("No popular posts found to interact with")
                 return
 
-            # Get interaction settings
-            interaction_types = self.config.get('popular_posts_interaction_types', ['like'])
-            reply_to_all = self.config.get('popular_posts_reply_to_all', False)
-            reply_chance = self.config.get('popular_posts_reply_chance', 0.3)
-
-            for post in popular_posts:
-                # Log post info with author if available
-                author_info = f" by @{post.get('author_username', 'unknown')}" if search_all_users else ""
-                keyword_info = f" (keyword: {post.get('keyword', 'N/A')})" if search_all_users else ""
-                logger.info(f"Processing popular post{author_info}: {post['text'][:100]}... (Likes: {post['likes']}){keyword_info}")
-
-                # Determine interactions for this post
-                post_interactions = interaction_types.copy()
-
-                # Handle reply logic
-                if reply_to_all:
-                    # Reply to ALL posts when reply_to_all is enabled
-                    if 'reply' not in post_interactions:
-                        post_interactions.append('reply')
-                    logger.info("Will reply to this post (reply_to_all enabled)")
-                else:
-                    # Use chance-based reply system
-                    if 'reply' not in post_interactions and random.random() < reply_chance:
-                        post_interactions.append('reply')
-                        logger.info(f"Will reply to this post (random chance: {reply_chance})")
-
-                # Interact with the post
-                success = self.interact_with_post(post, post_interactions)
-                if success:
-                    logger.info(f"Successfully interacted with popular post {post['id']}")
-                else:
-                    logger.error(f"Failed to interact with popular post {post['id']}")
-
-                # Add delay between posts to avoid rate limiting
-                time.sleep(5)
+            self.queue_popular_interactions(popular_posts)
 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error checking and interacting with popular posts: {e}")
 
+    def queue_popular_interactions(self, popular_posts: list):
+        """Pick the interactions for each popular post and queue them as separate tasks."""
+        search_all_users = self.config.get('search_all_users', False)
+
+        # Get interaction settings
+        interaction_types = self.config.get('popular_posts_interaction_types', ['like'])
+        reply_to_all = self.config.get('popular_posts_reply_to_all', False)
+        reply_chance = self.config.get('popular_posts_reply_chance', 0.3)
+
+        for post in popular_posts:
+            # Log post info with author if available
+            author_info = f" by @{post.get('author_username', 'unknown')}"
+            keyword_info = f" (keyword: {post.get('keyword', 'N/A')})" if search_all_users else ""
+            logger.info(f"Processing popular post{author_info}: {post['text'][:100]}... (Likes: {post['likes']}){keyword_info}")
+
+            # Determine interactions for this post
+            post_interactions = interaction_types.copy()
+
+            # Handle reply logic
+            if reply_to_all:
+                # Reply to ALL posts when reply_to_all is enabled
+                if 'reply' not in post_interactions:
+                    post_interactions.append('reply')
+                logger.info("Will reply to this post (reply_to_all enabled)")
+            else:
+                # Use chance-based reply system
+                if 'reply' not in post_interactions and random.random() < reply_chance:
+                    post_interactions.append('reply')
+                    logger.info(f"Will reply to this post (random chance: {reply_chance})")
+
+            # Remember the post was acted on so a re-rank doesn't roll for it again
+            post['interactions_queued_at'] = clock.time()
+            self.state.save_candidate(post)
+
+            # Handle each post as its own task so mention work can run in between
+            self.job_executor.submit(self.interact_with_post, post, post_interactions,
+                                     priority=PRIORITY_POPULAR_POSTS)
+
     def create_and_post_tweet(self):
         """Generate a statement and post it to Twitter."""
         logger.info("Starting tweet generation and posting process")
         
         statement = self.generate_random_statement()
         if statement:
-            success = self.post_to_twitter(statement)
-            if success:
-                logger.info("Tweet posted successfully!")
-            else:
-                logger.error("Failed to post tweet")
+            def log_result(done: Future):
+                if not done.exception() and done.result():
+                    logger.info("Tweet posted successfully!")
+                else:
+                    logger.error("Failed to post tweet")
+
+            self.action_queue.enqueue('post', self.post_to_twitter, statement,
+                                      priority=PRIORITY_DAILY_POST).add_done_callback(log_result)
         else:
             logger.error("Failed to generate statement")
     
-    def run_scheduler(self):
-        """Run the bot with 24-hour scheduling and optional mention checking."""
+    def log_startup_configuration(self):
+        """Log which jobs the bot will run and how often."""
         mention_interval = self.config.get('mention_check_interval_minutes', 5)
         reply_to_mentions = self.config.get('reply_to_mentions', True)
         reply_to_replies = self.config.get('reply_to_replies', False)
         interact_with_popular_posts = self.config.get('interact_with_popular_posts', False)
         popular_posts_interval = self.config.get('popular_posts_check_interval_hours', 6)
         search_all_users = self.config.get('search_all_users', False)
-        target_username = self.config.get('target_twitter_username', 'unknown')
+        target_usernames = ', '.join(f"@{username}" for username in self.target_usernames()) or 'unknown'
 
-        # Log startup configuration
         log_message = f"Twitter bot started. Will post every 24 hours"
         if reply_to_mentions:
             log_message += f" and check mentions every {mention_interval} minutes"
@@ -891,58 +2653,168 @@ class TwitterBot:
                 keywords = self.config.get('search_keywords', ['trending'])
                 log_message += f" and search for popular posts from all users (keywords: {', '.join(keywords)}) every {popular_posts_interval} hours"
             else:
-                log_message += f" and check popular posts from @{target_username} every {popular_posts_interval} hours"
+                log_message += f" and check popular posts from {target_usernames} every {popular_posts_interval} hours"
 
             if self.config.get('check_popular_posts_on_startup', True):
                 log_message += " (including on startup)"
         log_message += "."
         logger.info(log_message)
 
+    def run_job(self, job):
+        """Run a scheduled job, deferring it until the window resets if an endpoint it needs is exhausted."""
+        try:
+            job()
+        except RateLimitExceeded as e:
+            retry_after = math.ceil(e.retry_after()) + 1
+            logger.warning(f"Deferring {job.__name__} for {retry_after}s: {e}")
+            schedule.every(retry_after).seconds.do(self.retry_job, job)
+        finally:
+            self.state.flush()
+
+    def retry_job(self, job):
+        """Queue a deferred job once."""
+        self.submit_job(job)
+        return schedule.CancelJob
+
+    def executor_for(self, job) -> PriorityExecutor:
+        """Return the executor a scheduled job runs on."""
+        return self.mention_executor if job == self.check_and_reply_to_mentions else self.job_executor
+
+    def submit_job(self, job) -> Future:
+        """Queue a job on the priority executor unless its previous run is still queued or running."""
+        queued = self.queued_jobs.get(job.__name__)
+        if queued and not queued.done():
+            logger.info(f"Skipping {job.__name__}: previous run has not finished")
+            return queued
+
+        future = self.executor_for(job).submit(self.run_job, job,
+                                          priority=self.JOB_PRIORITIES.get(job.__name__, PRIORITY_DAILY_POST))
+        self.queued_jobs[job.__name__] = future
+        return future
+
+    def run_scheduler(self):
+        """Run the bot with 24-hour scheduling and optional mention checking."""
+        mention_interval = self.config.get('mention_check_interval_minutes', 5)
+        reply_to_mentions = self.config.get('reply_to_mentions', True)
+        reply_to_replies = self.config.get('reply_to_replies', False)
+        interact_with_popular_posts = self.config.get('interact_with_popular_posts', False)
+        popular_posts_interval = self.config.get('popular_posts_check_interval_hours', 6)
+        candidate_refresh_interval = self.config.get('candidate_refresh_interval_minutes', 0)
+
+        self.log_startup_configuration()
+
         # Schedule the job to run every 24 hours
-        schedule.every(24).hours.do(self.create_and_post_tweet)
+        schedule.every(24).hours.do(self.submit_job, self.create_and_post_tweet)
 
-        # Schedule mention checking if enabled
-        if reply_to_mentions:
-            schedule.every(mention_interval).minutes.do(self.check_and_reply_to_mentions)
+        # Report the size of the in-memory tracking structures and trim what they no longer hold from disk
+        schedule.every(1).hours.do(self.log_memory_stats)
+        schedule.every(1).hours.do(self.prune_state)
 
-        # Schedule reply-to-replies checking if enabled
-        if self.config.get('reply_to_replies', False):
-            schedule.every(mention_interval).minutes.do(self.check_for_replies_to_bot)
+        # Schedule mention checking (both mention replies and replies to the bot) if enabled
+        if reply_to_mentions or reply_to_replies:
+            schedule.every(mention_interval).minutes.do(self.submit_job, self.check_and_reply_to_mentions)
 
         # Schedule popular posts interaction if enabled
         if interact_with_popular_posts:
-            schedule.every(popular_posts_interval).hours.do(self.check_and_interact_with_popular_posts)
+            schedule.every(popular_posts_interval).hours.do(self.submit_job, self.check_and_interact_with_popular_posts)
+
+            # Keep candidate rankings fresh between full searches
+            if candidate_refresh_interval:
+                schedule.every(candidate_refresh_interval).minutes.do(self.submit_job, self.rerank_candidates)
 
         # Post immediately on startup (optional)
         if self.config.get('post_on_startup', False):
             logger.info("Posting initial tweet on startup")
-            self.create_and_post_tweet()
+            self.submit_job(self.create_and_post_tweet)
 
         # Check mentions immediately on startup if enabled
-        if reply_to_mentions:
+        if reply_to_mentions or reply_to_replies:
             logger.info("Checking mentions on startup")
-            self.check_and_reply_to_mentions()
-
-        # Check for replies to bot immediately on startup if enabled
-        if self.config.get('reply_to_replies', False):
-            logger.info("Checking for replies to bot on startup")
-            self.check_for_replies_to_bot()
+            self.submit_job(self.check_and_reply_to_mentions)
 
         # Check popular posts immediately on startup if enabled
         if interact_with_popular_posts and self.config.get('check_popular_posts_on_startup', True):
             logger.info("Checking popular posts on startup")
-            self.check_and_interact_with_popular_posts()
+            self.submit_job(self.check_and_interact_with_popular_posts)
 
         # Keep the script running
         while True:
             schedule.run_pending()
-            time.sleep(60)  # Check every minute
+            clock.sleep(60)  # Check every minute
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Await a blocking Twitter/OpenRouter call without stalling the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def run_periodic(self, job, interval_seconds: float, run_on_startup: bool = False):
+        """Run a job forever on its own interval, independently of the other jobs."""
+        if not run_on_startup:
+            await asyncio.sleep(interval_seconds)
+
+        priority = self.JOB_PRIORITIES.get(job.__name__, PRIORITY_DAILY_POST)
+        while True:
+            try:
+                await asyncio.wrap_future(self.executor_for(job).submit(job, priority=priority))
+            except RateLimitExceeded as e:
+                retry_after = e.retry_after() + 1
+                logger.warning(f"Deferring {job.__name__} for {retry_after:.0f}s: {e}")
+                await asyncio.sleep(retry_after)
+                continue
+            except Exception as e:
+                logger.error(f"Error running {job.__name__}: {e}")
+            finally:
+                await self.run_blocking(self.state.flush)
+            await asyncio.sleep(interval_seconds)
+
+    async def run_async(self):
+        """Run the bot on asyncio so each job's network I/O and pauses overlap with the others."""
+        mention_interval = self.config.get('mention_check_interval_minutes', 5)
+        reply_to_mentions = self.config.get('reply_to_mentions', True)
+        reply_to_replies = self.config.get('reply_to_replies', False)
+        interact_with_popular_posts = self.config.get('interact_with_popular_posts', False)
+        popular_posts_interval = self.config.get('popular_posts_check_interval_hours', 6)
+        candidate_refresh_interval = self.config.get('candidate_refresh_interval_minutes', 0)
+
+        self.log_startup_configuration()
+
+        tasks = [
+            self.run_periodic(self.create_and_post_tweet, 24 * 3600,
+                              run_on_startup=self.config.get('post_on_startup', False)),
+            self.run_periodic(self.log_memory_stats, 3600),
+            self.run_periodic(self.prune_state, 3600)
+        ]
+
+        if reply_to_mentions or reply_to_replies:
+            tasks.append(self.run_periodic(self.check_and_reply_to_mentions, mention_interval * 60,
+                                           run_on_startup=True))
+
+        if interact_with_popular_posts:
+            tasks.append(self.run_periodic(
+                self.check_and_interact_with_popular_posts, popular_posts_interval * 3600,
+                run_on_startup=self.config.get('check_popular_posts_on_startup', True)
+            ))
+            if candidate_refresh_interval:
+                tasks.append(self.run_periodic(self.rerank_candidates, candidate_refresh_interval * 60))
+
+        # One job worker per periodic task, so a long popular-posts run never holds up the mention check
+        if self.threaded:
+            self.job_executor.max_workers = max(self.job_executor.max_workers, len(tasks))
+        await asyncio.gather(*tasks)
 
 def main():
     """Main function to run the Twitter bot."""
+    configure_logging()
     try:
         bot = TwitterBot()
-        bot.run_scheduler()
+        try:
+            if bot.config.get('async_mode', False):
+                asyncio.run(bot.run_async())
+            else:
+                bot.run_scheduler()
+        finally:
+            bot.openrouter.close()
+            bot.state.close()
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e: